@@ -0,0 +1,96 @@
+"""
+Times the allocation engine on a synthetic cohort, and optionally the full
+run_allocation() round trip against a scratch database.
+
+    python benchmarks/allocation.py --students 10000 --projects 2000 --choices 10 [--db]
+"""
+import argparse
+import random
+
+from common import Timer, setup_django
+
+
+def synthetic(students, projects, supervisors, choices, rng):
+    # Popularity is skewed so a few projects are heavily oversubscribed
+    weights = [1 / (i + 1) ** 0.8 for i in range(projects)]
+    preferences = {}
+    for student in range(students):
+        ranked = []
+        seen = set()
+        while len(ranked) < choices:
+            project = rng.choices(range(projects), weights)[0]
+            if project not in seen:
+                seen.add(project)
+                ranked.append(project)
+        preferences[student] = ranked
+    project_supervisor = {project: project % supervisors for project in range(projects)}
+    capacity = {supervisor: rng.randint(3, 8) for supervisor in range(supervisors)}
+    return preferences, project_supervisor, capacity
+
+
+def seed_database(preferences, project_supervisor, capacity):
+    from django.db import transaction
+    from register.models import Supervisor, Student, Project, ProjectPreference
+
+    with transaction.atomic():
+        supervisors = Supervisor.objects.bulk_create(
+            Supervisor(name='S', surname=str(i), email=f'sup{i}@bench', sussex_id=f'SUP{i}',
+                       department='Informatics', telephone_number='0', capacity=capacity[i])
+            for i in range(len(capacity))
+        )
+        students = Student.objects.bulk_create(
+            Student(name='S', surname=str(i), email=f'stu{i}@bench', sussex_id=f'STU{i}', course='CS')
+            for i in range(len(preferences))
+        )
+        projects = Project.objects.bulk_create(
+            Project(title=f'Project {i}', description='', required_skills='', status='Proposed',
+                    supervisor=supervisors[project_supervisor[i]])
+            for i in range(len(project_supervisor))
+        )
+        ProjectPreference.objects.bulk_create(
+            (ProjectPreference(student=students[student], project=projects[project], rank=rank)
+             for student, ranked in preferences.items() for rank, project in enumerate(ranked, start=1)),
+            batch_size=5000,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--projects', type=int, default=2000)
+    parser.add_argument('--supervisors', type=int, default=400)
+    parser.add_argument('--choices', type=int, default=10)
+    parser.add_argument('--db', action='store_true', help='Also time run_allocation() against a scratch database')
+    args = parser.parse_args()
+
+    setup_django()
+    from register.allocation import allocate, run_allocation
+
+    rng = random.Random(2024)
+    preferences, project_supervisor, capacity = synthetic(
+        args.students, args.projects, args.supervisors, args.choices, rng
+    )
+    with Timer() as timer:
+        assignment = allocate(preferences, project_supervisor, capacity, seed=1)
+    ranks = [preferences[student].index(project) + 1 for student, project in assignment.items()]
+    print(f'Engine: {args.students} students x {args.projects} projects, {args.choices} choices each')
+    print(f'  allocated {len(assignment)} in {timer.elapsed:.2f}s, '
+          f'first choice {ranks.count(1)}, mean rank {sum(ranks) / max(len(ranks), 1):.2f}')
+
+    if args.db:
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        call_command('migrate', verbosity=0)
+        with Timer() as timer:
+            seed_database(preferences, project_supervisor, capacity)
+        print(f'Seeded scratch database in {timer.elapsed:.1f}s')
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            assignment = run_allocation(seed=1)
+        print(f'run_allocation: {len(assignment)} projects written in {timer.elapsed:.2f}s '
+              f'using {len(queries)} queries')
+
+
+if __name__ == '__main__':
+    main()
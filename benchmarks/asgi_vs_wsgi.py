@@ -0,0 +1,184 @@
+"""
+Throughput of the same pages served through wsgi.py and through asgi.py at
+high concurrency, with the server pinned to one core. A scratch database is
+seeded, then each server is started in turn on it and hammered by an asyncio
+client opening one connection per request.
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 50,200,500 --requests 2000
+
+WSGI is served by a thread per connection (as ``runserver`` does) and ASGI by
+uvicorn with a single worker. The REST scenario hits the DRF list view under
+WSGI and its async counterpart under ASGI; the pages are async views under
+both, which WSGI runs through async_to_sync.
+
+Scenarios:
+    api               GET /project/all/ (WSGI) or /async/project/all/ (ASGI)
+    catalogue         GET /proposed-projects/ as a student
+    supervisor_home   GET /supervisor_home/ as a supervisor
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from common import Timer, percentile, setup_django
+
+SCENARIOS = {
+    'api': {'wsgi': '/project/all/?page_size=50', 'asgi': '/async/project/all/?page_size=50', 'as': None},
+    'catalogue': {'wsgi': '/proposed-projects/', 'asgi': '/proposed-projects/', 'as': 'student'},
+    'supervisor_home': {'wsgi': '/supervisor_home/', 'asgi': '/supervisor_home/', 'as': 'supervisor'},
+}
+
+
+def serve(kind, db_name, port, cpu):
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+    setup_django(db_name)
+    from django.conf import settings
+    settings.ALLOWED_HOSTS = ['127.0.0.1']
+
+    if kind == 'asgi':
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+
+        uvicorn.run(get_asgi_application(), host='127.0.0.1', port=port, log_level='warning', access_log=False,
+                    backlog=4096)
+    else:
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+        from django.core.wsgi import get_wsgi_application
+
+        class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+            request_queue_size = 4096
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        make_server('127.0.0.1', port, get_wsgi_application(), ThreadingWSGIServer, QuietHandler).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+async def fetch(port, path, cookie):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    headers = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+    if cookie:
+        headers += f'Cookie: sessionid={cookie}\r\n'
+    writer.write((headers + '\r\n').encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def hammer(port, path, cookie, requests, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path, cookie)
+            except (OSError, IndexError, ValueError):
+                status = 599
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    with Timer() as timer:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, timer.elapsed
+
+
+def sessions(prefix):
+    from django.test import Client
+    from register.models import Student, Supervisor
+    from register.seeding import student_username, supervisor_username
+
+    cookies = {None: None}
+    for role, model, username in (('student', Student, student_username(prefix, 0)),
+                                  ('supervisor', Supervisor, supervisor_username(prefix, 0))):
+        client = Client()
+        client.force_login(model.objects.get(user__username=username).user)
+        cookies[role] = client.cookies['sessionid'].value
+    return cookies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--cpu', type=int, default=0, help='Core the server is pinned to, -1 to leave it unpinned')
+    parser.add_argument('--concurrency', default='50,200,500')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario and concurrency level')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--supervisors', type=int, default=50)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--topics', type=int, default=50)
+    parser.add_argument('--projects', type=int, default=500)
+    parser.add_argument('--prefix', default='load')
+    args = parser.parse_args()
+    cpu = None if args.cpu < 0 else args.cpu
+
+    if args.serve:
+        serve(args.serve, args.db, args.port, cpu)
+        return
+
+    db_name = setup_django()
+    from django.core.management import call_command
+    from register.seeding import seed
+
+    call_command('migrate', verbosity=0)
+    seed(args.supervisors, args.students, args.topics, args.projects, prefix=args.prefix)
+    cookies = sessions(args.prefix)
+
+    print(f'{"server":<8}{"scenario":<18}{"concurrency":>12}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+          f'{"p99 ms":>10}{"errors":>8}')
+    for kind in ('wsgi', 'asgi'):
+        port = free_port()
+        server = subprocess.Popen([sys.executable, __file__, '--serve', kind, '--db', db_name, '--port', str(port),
+                                   '--cpu', str(args.cpu)])
+        try:
+            wait_for(port)
+            for name in args.scenarios.split(','):
+                scenario = SCENARIOS[name]
+                path, cookie = scenario[kind], cookies[scenario['as']]
+                # Warm the caches and connections before timing
+                asyncio.run(hammer(port, path, cookie, 20, 4))
+                for concurrency in (int(value) for value in args.concurrency.split(',')):
+                    latencies, errors, elapsed = asyncio.run(hammer(port, path, cookie, args.requests, concurrency))
+                    times = [latency * 1000 for latency in latencies]
+                    print(f'{kind:<8}{name:<18}{concurrency:>12}{len(times) / elapsed:>10.1f}'
+                          f'{percentile(times, 50):>10.1f}{percentile(times, 95):>10.1f}'
+                          f'{percentile(times, 99):>10.1f}{errors:>8}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
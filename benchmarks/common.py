@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_name=None):
+    """Configure Django against a scratch SQLite database so benchmarks never touch webappsretake.db."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webappsretake2024.settings')
+
+    from django.conf import settings
+    if db_name is None:
+        db_name = os.path.join(tempfile.mkdtemp(prefix='spms-bench-'), 'bench.db')
+    settings.DATABASES['default']['NAME'] = db_name
+    settings.DEBUG = False
+    # Per-request instrumentation would add its own overhead to every timing
+    settings.INSTRUMENTATION_SAMPLE_RATE = 0
+
+    import django
+    django.setup()
+    return db_name
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
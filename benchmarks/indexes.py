@@ -0,0 +1,140 @@
+"""
+Seeds a scratch database with projects and notifications and compares the
+hot Project/Notification filters with and without the indexes added in the
+0006 migration. The schema is migrated to the current models and those
+indexes are dropped for the "before" plans, then built again.
+
+    python -m benchmarks.indexes --projects 100000 --notifications 1000000
+"""
+import argparse
+import random
+
+from benchmarks.common import Timer, setup_django
+
+STATUSES = ['Accepted', 'Proposed', 'Available', 'Requested', 'Confirmed']
+# Added by 0006_project_notification_indexes
+INDEXES = {
+    'Notification': ['notification_user_read_idx', 'notification_unread_idx'],
+    'Project': ['project_status_idx', 'project_supervisor_status_idx'],
+}
+
+
+def seed(projects, notifications, supervisors=500, students=5000, users=500):
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from register.models import Supervisor, Student, Project, Notification
+
+    rng = random.Random(2024)
+    with transaction.atomic():
+        User.objects.bulk_create(User(username=f'bench{i}') for i in range(users))
+        user_ids = list(User.objects.values_list('id', flat=True))
+        Supervisor.objects.bulk_create(
+            Supervisor(name='S', surname=str(i), email=f'sup{i}@bench', sussex_id=f'SUP{i}',
+                       department='Informatics', telephone_number='0')
+            for i in range(supervisors)
+        )
+        Student.objects.bulk_create(
+            Student(name='S', surname=str(i), email=f'stu{i}@bench', sussex_id=f'STU{i}', course='CS')
+            for i in range(students)
+        )
+    supervisor_ids = list(Supervisor.objects.values_list('id', flat=True))
+    student_ids = list(Student.objects.values_list('id', flat=True))
+
+    batch = 10000
+    for start in range(0, projects, batch):
+        with transaction.atomic():
+            Project.objects.bulk_create(
+                Project(title=f'Project {i}', description='', required_skills='',
+                        status=rng.choice(STATUSES), supervisor_id=rng.choice(supervisor_ids),
+                        proposed_by_id=rng.choice(student_ids) if rng.random() < 0.3 else None)
+                for i in range(start, min(start + batch, projects))
+            )
+    for start in range(0, notifications, batch):
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                Notification(user_id=rng.choice(user_ids), message='bench', read=rng.random() < 0.95)
+                for _ in range(start, min(start + batch, notifications))
+            )
+    return supervisor_ids, student_ids, user_ids
+
+
+def queries(supervisor_id, student_id, user_id):
+    from register.models import Project, Notification
+    return {
+        'proposed catalogue': Project.objects.filter(status='Proposed'),
+        'manage_proposals': Project.objects.filter(status='Requested'),
+        'accepted_projects': Project.objects.filter(supervisor_id=supervisor_id, status='Accepted'),
+        'existing project': Project.objects.filter(proposed_by_id=student_id)[:1],
+        'unread notifications': Notification.objects.filter(user_id=user_id, read=False).order_by('-created_at')[:20],
+    }
+
+
+def indexes():
+    from django.apps import apps
+
+    for model_name, names in INDEXES.items():
+        model = apps.get_model('register', model_name)
+        for index in model._meta.indexes:
+            if index.name in names:
+                yield model, index
+
+
+def drop_indexes():
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in indexes():
+            editor.remove_index(model, index)
+
+
+def create_indexes():
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in indexes():
+            editor.add_index(model, index)
+
+
+def measure(label, ids, repeat=20):
+    from django.db import connection
+
+    print(f'\n== {label}')
+    for name, queryset in queries(*ids).items():
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '; '.join(row[-1] for row in cursor.fetchall())
+        with Timer() as timer:
+            for _ in range(repeat):
+                list(queryset.all())
+        print(f'{name:22} {timer.elapsed / repeat * 1000:8.2f} ms  {plan}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--projects', type=int, default=100000)
+    parser.add_argument('--notifications', type=int, default=1000000)
+    parser.add_argument('--db', default=None, help='scratch SQLite file, a temporary one is used by default')
+    args = parser.parse_args()
+
+    db_name = setup_django(args.db)
+    from django.core.management import call_command
+
+    print(f'Using {db_name}')
+    call_command('migrate', verbosity=0)
+    drop_indexes()
+
+    with Timer() as timer:
+        supervisor_ids, student_ids, user_ids = seed(args.projects, args.notifications)
+    print(f'Seeded {args.projects} projects and {args.notifications} notifications in {timer.elapsed:.1f}s')
+    ids = (supervisor_ids[0], student_ids[0], user_ids[0])
+
+    measure('before indexes', ids)
+    with Timer() as timer:
+        create_indexes()
+    print(f'\nBuilt indexes in {timer.elapsed:.1f}s')
+    measure('after indexes', ids)
+
+
+if __name__ == '__main__':
+    main()
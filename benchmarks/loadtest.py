@@ -0,0 +1,192 @@
+"""
+Simulates allocation-week traffic with scripted user journeys and reports
+latency percentiles, throughput and queries per request for every step.
+
+Against the Django test client and a freshly seeded scratch database:
+
+    python benchmarks/loadtest.py --users 200 --concurrency 8
+
+Against a running server seeded with ``manage.py seed_load_test``, where queries
+per request are not visible:
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --users 200 --concurrency 8
+
+Journeys:
+    student     login -> proposed projects -> request a project
+    supervisor  login -> manage proposals -> accept or reject one
+    api         GET /project/all/
+"""
+import argparse
+import http.cookiejar
+import random
+import re
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, percentile, setup_django
+
+REQUEST_LINK = re.compile(r'action="/request-project/(\d+)/"')
+PROPOSAL_ID = re.compile(r'name="project_id" value="(\d+)"')
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, step, elapsed, queries, status):
+        with self.lock:
+            self.samples[step].append((elapsed, queries, status))
+
+
+class TestClientSession:
+    """One browser session through django.test.Client, counting queries per request."""
+
+    def __init__(self, recorder):
+        from django.test import Client
+        self.client = Client()
+        self.recorder = recorder
+
+    def request(self, step, method, path, data=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            response = getattr(self.client, method)(path, data or {})
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        self.recorder.add(step, timer.elapsed, len(queries), response.status_code)
+        return body.decode(errors='replace')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    """One browser session against a running server, with cookies and CSRF handled."""
+
+    def __init__(self, recorder, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.recorder = recorder
+
+    def csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def request(self, step, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        if method == 'post':
+            body = urllib.parse.urlencode({**(data or {}), 'csrfmiddlewaretoken': self.csrf_token()}).encode()
+        request = urllib.request.Request(url, data=body, headers={'Referer': url})
+        with Timer() as timer:
+            try:
+                with self.opener.open(request) as response:
+                    status, content = response.status, response.read()
+            except urllib.error.HTTPError as error:
+                status, content = error.code, error.read()
+        self.recorder.add(step, timer.elapsed, None, status)
+        return content.decode(errors='replace')
+
+
+def login(session, username, password):
+    # The GET sets the CSRF cookie for servers that enforce it
+    session.request('login page', 'get', '/login/')
+    session.request('login', 'post', '/login/', {'username': username, 'password': password})
+
+
+def student_journey(session, username, password, rng):
+    login(session, username, password)
+    page = session.request('proposed_projects', 'get', '/proposed-projects/')
+    project_ids = REQUEST_LINK.findall(page)
+    if project_ids:
+        session.request('request_project', 'post', f'/request-project/{rng.choice(project_ids)}/')
+
+
+def supervisor_journey(session, username, password, rng):
+    login(session, username, password)
+    page = session.request('manage_proposals', 'get', '/manage-proposals/')
+    project_ids = PROPOSAL_ID.findall(page)
+    if project_ids:
+        action = 'accept_project' if rng.random() < 0.7 else 'reject_project'
+        session.request('manage_proposals action', 'post', '/manage-proposals/',
+                        {'project_id': rng.choice(project_ids), action: ''})
+
+
+def api_journey(session, username, password, rng):
+    session.request('api project list', 'get', '/project/all/')
+
+
+def report(recorder, elapsed):
+    total = sum(len(samples) for samples in recorder.samples.values())
+    print(f'{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} requests/s')
+    print(f'{"step":<26}{"count":>7}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}{"errors":>8}')
+    for step, samples in recorder.samples.items():
+        times = [sample[0] * 1000 for sample in samples]
+        queries = [sample[1] for sample in samples if sample[1] is not None]
+        errors = sum(1 for sample in samples if sample[2] >= 400)
+        mean_queries = f'{sum(queries) / len(queries):.1f}' if queries else 'n/a'
+        print(f'{step:<26}{len(samples):>7}{percentile(times, 50):>10.1f}{percentile(times, 95):>10.1f}'
+              f'{percentile(times, 99):>10.1f}{mean_queries:>9}{errors:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='Base URL of a running server, otherwise the test client is used')
+    parser.add_argument('--users', type=int, default=100, help='Journeys of each kind to run')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--supervisors', type=int, default=50)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--topics', type=int, default=50)
+    parser.add_argument('--projects', type=int, default=500)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--prefix', default='load')
+    parser.add_argument('--journeys', default='student,supervisor,api')
+    args = parser.parse_args()
+
+    setup_django()
+    from register.seeding import seed, student_username, supervisor_username
+
+    if args.url:
+        make_session = lambda recorder: HTTPSession(recorder, args.url)
+    else:
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        call_command('migrate', verbosity=0)
+        with Timer() as timer:
+            counts = seed(args.supervisors, args.students, args.topics, args.projects,
+                          password=args.password, prefix=args.prefix)
+        print(f'Seeded {counts} in {timer.elapsed:.1f}s')
+        make_session = TestClientSession
+
+    journeys = {
+        'student': (student_journey, lambda i: student_username(args.prefix, i)),
+        'supervisor': (supervisor_journey, lambda i: supervisor_username(args.prefix, i % args.supervisors)),
+        'api': (api_journey, lambda i: None),
+    }
+    recorder = Recorder()
+    rng = random.Random(2024)
+    tasks = [(name, i, rng.random()) for name in args.journeys.split(',') for i in range(args.users)]
+    rng.shuffle(tasks)
+
+    def run(task):
+        name, i, seed_value = task
+        journey, username = journeys[name]
+        journey(make_session(recorder), username(i), args.password, random.Random(seed_value))
+
+    with Timer() as timer, ThreadPoolExecutor(args.concurrency) as executor:
+        for _ in executor.map(run, tasks):
+            pass
+    report(recorder, timer.elapsed)
+
+
+if __name__ == '__main__':
+    main()
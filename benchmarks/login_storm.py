@@ -0,0 +1,95 @@
+"""
+Many students logging in at once, as when allocation opens. Each session
+mode and hasher work factor is timed against a freshly seeded scratch
+database, or against a running server with --url (which must already be
+seeded with ``manage.py seed_load_test`` and configured the way it should be
+measured).
+
+    python benchmarks/login_storm.py --users 500 --modes db,cached_db,cache,signed_cookies --iterations 1000000,260000
+
+Once everyone has logged in, each session loads the student home page again
+and the run reports how many are still logged in, so a session store that
+drops sessions under load (a culled cache) shows up.
+"""
+import argparse
+
+from common import Timer, setup_django
+from loadtest import HTTPSession, Recorder, TestClientSession, login, report
+
+STILL_LOGGED_IN = 'still logged in'
+
+
+def storm(make_session, usernames, password, concurrency):
+    from concurrent.futures import ThreadPoolExecutor
+
+    recorder = Recorder()
+
+    def run(username):
+        session = make_session(recorder)
+        login(session, username, password)
+        # The first page after logging in reads the new session back
+        session.request('home', 'get', '/')
+        return session
+
+    with Timer() as timer, ThreadPoolExecutor(concurrency) as executor:
+        sessions = list(executor.map(run, usernames))
+    # Outside the timing, a logged out student is redirected to the login page
+    for session in sessions:
+        session.request(STILL_LOGGED_IN, 'get', '/student_home/')
+    return recorder, timer.elapsed
+
+
+def report_sessions(recorder):
+    statuses = [sample[2] for sample in recorder.samples.pop(STILL_LOGGED_IN)]
+    kept = statuses.count(200)
+    print(f'{kept} of {len(statuses)} sessions still logged in after the storm')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='Base URL of a running server, otherwise the test client is used')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--modes', default='db,cached_db,cache,signed_cookies', help='SESSION_MODE values to compare')
+    parser.add_argument('--iterations', default='', help='PBKDF2 work factors to compare, default is Django\'s')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--prefix', default='load')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from register.seeding import seed, student_username
+
+    usernames = [student_username(args.prefix, i) for i in range(args.users)]
+    if args.url:
+        recorder, elapsed = storm(lambda recorder: HTTPSession(recorder, args.url), usernames, args.password,
+                                  args.concurrency)
+        report_sessions(recorder)
+        report(recorder, elapsed)
+        return
+
+    from django.core.management import call_command
+    from django.test.utils import override_settings, setup_test_environment
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    iterations = [int(value) for value in args.iterations.split(',') if value] or [None]
+    for work_factor in iterations:
+        # Seeding under each work factor so logins measure the policy rather than a rehash
+        prefix = f'{args.prefix}{work_factor or "default"}'
+        hasher_settings = {'PASSWORD_PBKDF2_ITERATIONS': work_factor} if work_factor else {}
+        with override_settings(**hasher_settings):
+            seed(1, args.users, 0, 0, password=args.password, prefix=prefix)
+            for mode in args.modes.split(','):
+                with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+                    recorder, elapsed = storm(
+                        TestClientSession, [student_username(prefix, i) for i in range(args.users)],
+                        args.password, args.concurrency,
+                    )
+                print(f'\nSESSION_MODE={mode} PBKDF2 iterations={work_factor or "default"}')
+                report_sessions(recorder)
+                report(recorder, elapsed)
+
+
+if __name__ == '__main__':
+    main()
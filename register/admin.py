@@ -1,62 +1,167 @@
+import io
 
 from django.urls import path
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 from django.utils.html import format_html
 
 
 # Register your models here.
+from .aggregates import GroupConcat
+from .forms import BulkImportForm
+from .importing import format_for, import_file
 from .models import Supervisor, Student, Project, ProjectTopic
+from .search import get_search_backend
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key by typing, with suggestions from the admin
+    autocomplete endpoint, instead of listing every related row in the sidebar.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__id__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        value = self.used_parameters.get(self.lookup_kwarg)
+        self.lookup_val = value[-1] if isinstance(value, list) else value
+        self.app_label = model._meta.app_label
+        self.model_name = model._meta.model_name
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def selected_label(self):
+        if not self.lookup_val:
+            return ''
+        selected = self.field.remote_field.model._default_manager.filter(pk=self.lookup_val).first()
+        return str(selected) if selected else self.lookup_val
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+
+class BulkImportMixin:
+    """Adds an Import button to the changelist for uploading rows through register.importing."""
+    import_kind = None
+    change_list_template = 'admin/bulk_import_change_list.html'
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name=f'{opts.app_label}_{opts.model_name}_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        result = None
+        form = BulkImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            dry_run = form.cleaned_data['dry_run']
+            # Passwords are hashed in this process, manage.py bulk_import spreads
+            # them over a process pool for large cohorts
+            result = import_file(
+                self.import_kind, io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''),
+                format_for(upload.name), dry_run=dry_run,
+            )
+            verb = 'would be imported' if dry_run else 'imported'
+            messages.info(request, f'{result.created} {self.import_kind} {verb}, {len(result.errors)} rows rejected.')
+        return render(request, 'admin/bulk_import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Import {self.model._meta.verbose_name_plural}',
+            'form': form,
+            'errors': sorted(result.errors) if result else [],
+        })
+
 
 class ProjectInline(admin.TabularInline):
     model = Project
     extra = 1
+    autocomplete_fields = ('proposed_by',)
 
 @admin.register(Supervisor)
-class SupervisorAdmin(admin.ModelAdmin):
-    list_display = ('user', 'name', 'surname', 'email', 'sussex_id', 'department', 'telephone_number', 'list_projects')
+class SupervisorAdmin(BulkImportMixin, admin.ModelAdmin):
+    import_kind = 'supervisors'
+    list_display = ('user', 'name', 'surname', 'email', 'sussex_id', 'department', 'telephone_number',
+                    'project_count', 'list_projects')
     search_fields = ('name', 'surname', 'sussex_id', 'department', 'user__username', 'email')
     inlines = [ProjectInline]
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user').prefetch_related('project_set')
+        return super().get_queryset(request).select_related('user').annotate(
+            project_count=Count('project'),
+            project_titles=GroupConcat('project__title'),
+        )
+
+    def project_count(self, obj):
+        return obj.project_count
+    project_count.short_description = 'No. of Projects'
+    project_count.admin_order_field = 'project_count'
 
     def list_projects(self, obj):
-        projects = obj.project_set.all()
-        return format_html(", ".join([p.title for p in projects]))
+        return obj.project_titles or ''
 
     list_projects.short_description = 'Projects'
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(BulkImportMixin, admin.ModelAdmin):
+    import_kind = 'students'
     list_display = ('user', 'name', 'surname', 'email', 'sussex_id', 'course', 'selected_project')
     search_fields = ('name', 'surname', 'sussex_id', 'course', 'user__username', 'email')
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user').prefetch_related('project_set')
+        return super().get_queryset(request).select_related('user').annotate(
+            project_titles=GroupConcat('project__title'),
+        )
 
     def selected_project(self, obj):
-        projects = obj.project_set.all()
-        if projects.exists():
-            return ', '.join([p.title for p in projects])
-        return 'No Project'
+        return obj.project_titles or 'No Project'
     selected_project.short_description = 'Selected/Proposed Project'
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(BulkImportMixin, admin.ModelAdmin):
+    import_kind = 'projects'
     list_display = ('title', 'status', 'supervisor', 'proposed_by')
-    list_filter = ('status', 'supervisor', 'proposed_by')
-    search_fields = ('title', 'supervisor__user__username', 'proposed_by__user__username')
+    list_filter = ('status', ('supervisor', AutocompleteFilter), ('proposed_by', AutocompleteFilter))
+    autocomplete_fields = ('supervisor', 'proposed_by')
+    # Project text is matched through the full-text index in get_search_results
+    search_fields = ('supervisor__user__username', 'proposed_by__user__username')
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('supervisor', 'proposed_by')
+        return super().get_queryset(request).select_related('supervisor__user', 'proposed_by__user')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = get_search_backend().search(search_term)
+        like_results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=ids) | like_results, may_have_duplicates
 
 @admin.register(ProjectTopic)
-class ProjectTopicAdmin(admin.ModelAdmin):
-    list_display = ('title',)
+class ProjectTopicAdmin(BulkImportMixin, admin.ModelAdmin):
+    import_kind = 'topics'
+    list_display = ('title', 'project_count')
     search_fields = ('title',)
 
     filter_horizontal = ('projects',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(project_count=Count('projects'))
+
+    def project_count(self, obj):
+        return obj.project_count
+    project_count.short_description = 'No. of Projects'
+    project_count.admin_order_field = 'project_count'
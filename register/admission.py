@@ -0,0 +1,197 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.module_loading import import_string
+
+IDEMPOTENCY_FIELD = 'idempotency_key'
+_PENDING = 'pending'
+
+DEFAULT_POLICY = {
+    # Token buckets as tokens added per second and the most that can be saved up
+    'user_rate': 0.5,
+    'user_burst': 3,
+    'global_rate': 50,
+    'global_burst': 200,
+    # Requests running at once in this process, and how many more may wait
+    'max_in_flight': 8,
+    'max_queue': 32,
+    'queue_timeout': 2.0,
+    'idempotency_ttl': 5 * 60,
+}
+
+
+def state_cache():
+    # Buckets and idempotency keys must not be culled to make room for cached
+    # pages, a culled bucket comes back full and a culled key lets a duplicate through
+    return caches[settings.ADMISSION_CACHE_ALIAS]
+
+
+class InProcessBucketStore:
+    """Token buckets for this process only, exact under threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, rate, burst, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            allowed, tokens, retry_after = _take(tokens, updated, rate, burst, now)
+            self.buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class CacheBucketStore:
+    """
+    Token buckets in the shared state cache, so every process draws on the
+    same allowance. The read-modify-write is not atomic across processes, so a
+    burst can be admitted slightly over its limit.
+    """
+    timeout = 60 * 60
+
+    def take(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        cache, cache_key = state_cache(), f'register:bucket:{key}'
+        tokens, updated = cache.get(cache_key, (burst, now))
+        allowed, tokens, retry_after = _take(tokens, updated, rate, burst, now)
+        cache.set(cache_key, (tokens, now), self.timeout)
+        return allowed, retry_after
+
+
+def _take(tokens, updated, rate, burst, now):
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / rate
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.ADMISSION_BUCKET_STORE)()
+    return _store
+
+
+class Gate:
+    """At most ``max_in_flight`` callers at once, with a bounded number waiting their turn."""
+
+    def __init__(self, max_in_flight, max_queue):
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.max_queue = max_queue
+        self.waiting = 0
+
+    def enter(self, timeout):
+        if self.slots.acquire(blocking=False):
+            return True
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+        try:
+            return self.slots.acquire(timeout=timeout)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def leave(self):
+        self.slots.release()
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(name, policy):
+    key = (name, policy['max_in_flight'], policy['max_queue'])
+    with _gates_lock:
+        gate = _gates.get(key)
+        if gate is None:
+            gate = _gates[key] = Gate(policy['max_in_flight'], policy['max_queue'])
+    return gate
+
+
+def too_many_requests(retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    response = HttpResponse(f'Too many requests, please try again in {retry_after} seconds.', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def idempotency_key(request, name):
+    key = request.headers.get('Idempotency-Key') or request.POST.get(IDEMPOTENCY_FIELD)
+    if not key:
+        return None
+    return f'register:idempotency:{name}:{request.user.pk}:{request.path}:{key[:64]}'
+
+
+def admission_control(name):
+    """
+    Guard a view's POSTs with the ADMISSION_CONTROL[name] policy: a repeated
+    idempotency key replays the first redirect without running the view, then per-user and global
+    token buckets and a bounded in-process queue answer 429 with Retry-After
+    rather than letting a burst pile up on the database.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view_func(request, *args, **kwargs)
+            policy = {**DEFAULT_POLICY, **settings.ADMISSION_CONTROL.get(name, {})}
+            cache = state_cache()
+
+            key = idempotency_key(request, name)
+            if key is not None and not cache.add(key, _PENDING, policy['idempotency_ttl']):
+                stored = cache.get(key)
+                if stored == _PENDING:
+                    # The first copy is still running
+                    return too_many_requests(1)
+                if stored is not None:
+                    return HttpResponseRedirect(stored)
+
+            store = get_bucket_store()
+            for bucket, rate, burst in (
+                (f'{name}:user:{request.user.pk}', policy['user_rate'], policy['user_burst']),
+                (f'{name}:global', policy['global_rate'], policy['global_burst']),
+            ):
+                allowed, retry_after = store.take(bucket, rate, burst)
+                if not allowed:
+                    if key is not None:
+                        cache.delete(key)
+                    return too_many_requests(retry_after)
+
+            gate = get_gate(name, policy)
+            if not gate.enter(policy['queue_timeout']):
+                if key is not None:
+                    cache.delete(key)
+                return too_many_requests(policy['queue_timeout'])
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                if key is not None:
+                    cache.delete(key)
+                raise
+            finally:
+                gate.leave()
+
+            if key is not None:
+                # Only a completed write redirects, anything else (a form with errors) may be resubmitted
+                if response.has_header('Location'):
+                    cache.set(key, response['Location'], policy['idempotency_ttl'])
+                else:
+                    cache.delete(key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,14 @@
+from django.db.models import Aggregate, TextField
+
+
+class GroupConcat(Aggregate):
+    """Comma separated values of a related column, aggregated in the database."""
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function='STRING_AGG', template="%(function)s(%(expressions)s::text, ', ')",
+            **extra_context
+        )
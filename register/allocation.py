@@ -0,0 +1,140 @@
+import heapq
+import random
+from collections import defaultdict, deque
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Project, ProjectPreference, Supervisor
+from .transitions import projects_transitioned
+
+ALLOCATED_STATUS = 'Accepted'
+
+
+def allocate(preferences, project_supervisor, supervisor_capacity, lottery=None, seed=None):
+    """
+    Student-proposing deferred acceptance over ranked project preferences.
+
+    ``preferences`` maps student -> project ids in rank order, every project
+    takes one student and ``supervisor_capacity`` caps how many projects a
+    supervisor is allocated (missing or None means unlimited). When a project
+    or supervisor is oversubscribed the student who ranked it lowest loses,
+    ties broken by ``lottery`` (student -> number, drawn from ``seed`` when
+    omitted).
+
+    Returns a dict of student -> project. Each student proposes to each of
+    their projects at most once, so the work is O(P log P) in the total
+    number of submitted preferences.
+    """
+    if lottery is None:
+        rng = random.Random(seed)
+        lottery = {student: rng.random() for student in sorted(preferences)}
+
+    next_choice = defaultdict(int)
+    project_holder = {}
+    # Max-heap per supervisor of (priority, student), lazily pruned
+    supervisor_heap = defaultdict(list)
+    supervisor_load = defaultdict(int)
+    assigned = {}
+    free = deque(preferences)
+
+    rank_of = {}
+    for student, projects in preferences.items():
+        for rank, project in enumerate(projects):
+            rank_of[student, project] = rank
+
+    def priority(student, project):
+        # Higher is worse: rank given to the project, then lottery number
+        return rank_of[student, project], lottery[student]
+
+    def release(student):
+        project = assigned.pop(student)
+        del project_holder[project]
+        supervisor_load[project_supervisor[project]] -= 1
+        free.append(student)
+
+    while free:
+        student = free.popleft()
+        projects = preferences[student]
+        while next_choice[student] < len(projects):
+            project = projects[next_choice[student]]
+            next_choice[student] += 1
+            if project not in project_supervisor:
+                continue
+            supervisor = project_supervisor[project]
+            capacity = supervisor_capacity.get(supervisor)
+            mine = priority(student, project)
+
+            holder = project_holder.get(project)
+            if holder is not None:
+                if priority(holder, project) <= mine:
+                    continue
+                release(holder)
+            elif capacity is not None and supervisor_load[supervisor] >= capacity:
+                heap = supervisor_heap[supervisor]
+                while heap and assigned.get(heap[0][2]) != heap[0][3]:
+                    heapq.heappop(heap)
+                if capacity == 0 or (-heap[0][0][0], -heap[0][0][1]) <= mine:
+                    continue
+                release(heapq.heappop(heap)[2])
+
+            assigned[student] = project
+            project_holder[project] = student
+            supervisor_load[supervisor] += 1
+            if capacity is not None:
+                heapq.heappush(supervisor_heap[supervisor], ((-mine[0], -mine[1]), None, student, project))
+            break
+    return assigned
+
+
+def load_preferences():
+    preferences = defaultdict(list)
+    rows = (
+        ProjectPreference.objects
+        .filter(project__status='Proposed', project__proposed_by__isnull=True)
+        .exclude(student__project__isnull=False)
+        .order_by('student_id', 'rank')
+        .values_list('student_id', 'project_id')
+    )
+    for student_id, project_id in rows.iterator(chunk_size=5000):
+        preferences[student_id].append(project_id)
+    return dict(preferences)
+
+
+def run_allocation(dry_run=False, seed=None):
+    preferences = load_preferences()
+    project_supervisor = dict(
+        Project.objects.filter(status='Proposed', proposed_by__isnull=True, supervisor__isnull=False)
+        .values_list('id', 'supervisor_id')
+    )
+    # Existing allocations count against each supervisor's capacity
+    used = defaultdict(int)
+    for supervisor_id in Project.objects.filter(status__in=['Accepted', 'Confirmed']).values_list('supervisor_id', flat=True):
+        used[supervisor_id] += 1
+    supervisor_capacity = {
+        supervisor_id: max(capacity - used[supervisor_id], 0)
+        for supervisor_id, capacity in Supervisor.objects.filter(capacity__isnull=False).values_list('id', 'capacity')
+    }
+
+    assignment = allocate(preferences, project_supervisor, supervisor_capacity, seed=seed)
+    if dry_run or not assignment:
+        return assignment
+
+    with transaction.atomic():
+        # Skip anything requested through the normal flow since preferences were loaded
+        still_open = set(
+            Project.objects.select_for_update()
+            .filter(id__in=assignment.values(), status='Proposed', proposed_by__isnull=True)
+            .values_list('id', flat=True)
+        )
+        assignment = {student: project for student, project in assignment.items() if project in still_open}
+        now = timezone.now()
+        projects = [
+            Project(id=project_id, status=ALLOCATED_STATUS, proposed_by_id=student_id, updated_at=now)
+            for student_id, project_id in assignment.items()
+        ]
+        Project.objects.bulk_update(projects, ['status', 'proposed_by', 'updated_at'], batch_size=1000)
+
+    projects_transitioned.send(sender=Project, project_ids=list(assignment.values()), from_status='Proposed',
+                               to_status=ALLOCATED_STATUS)
+    return assignment
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_TIMEOUT = 60 * 60
+
+_missing = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def version_key(name):
+    return f'register:version:{name}'
+
+
+def get_version(name):
+    version = cache.get(version_key(name))
+    if version is None:
+        cache.add(version_key(name), uuid.uuid4().hex, None)
+        version = cache.get(version_key(name))
+    return version
+
+
+async def aget_version(name):
+    version = await cache.aget(version_key(name))
+    if version is None:
+        await cache.aadd(version_key(name), uuid.uuid4().hex, None)
+        version = await cache.aget(version_key(name))
+    return version
+
+
+def bump_version(name):
+    cache.set(version_key(name), uuid.uuid4().hex, None)
+
+
+def model_label(model):
+    return model if isinstance(model, str) else model._meta.label
+
+
+def model_version(models):
+    """One version string covering every model in ``models``, which changes whenever any of them is written."""
+    keys = [version_key(f'model:{model_label(model).lower()}') for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+async def amodel_version(models):
+    keys = [version_key(f'model:{model_label(model).lower()}') for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, uuid.uuid4().hex, None)
+            versions[key] = await cache.aget(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+def invalidate_on_commit(invalidate):
+    """
+    Run ``invalidate`` now and again once the surrounding transaction commits.
+
+    A reader between the two still sees the old rows and could cache them
+    under the new version, the second run drops that copy as well.
+    """
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+def bump_model_version(sender, **kwargs):
+    invalidate_on_commit(lambda: bump_version(f'model:{sender._meta.label_lower}'))
+
+
+def cache_key(name, models, vary_on=(), version=None):
+    vary = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    if version is None:
+        version = model_version(models)
+    return f'register:cached:{name}:{version}:{vary}'
+
+
+def cached(name, models, build, vary_on=(), timeout=DEFAULT_TIMEOUT):
+    """
+    ``build()`` cached under a key that includes the current version of each
+    of ``models``, so writes to any of them make the old entry unreachable.
+    """
+    key = cache_key(name, models, vary_on)
+    value = cache.get(key, _missing)
+    hit = value is not _missing
+    with _stats_lock:
+        _stats[name, hit] += 1
+    if not hit:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+async def acached(name, models, build, vary_on=(), timeout=DEFAULT_TIMEOUT):
+    """cached() for async views, where ``build`` is a coroutine function."""
+    key = cache_key(name, models, vary_on, version=await amodel_version(models))
+    value = await cache.aget(key, _missing)
+    hit = value is not _missing
+    with _stats_lock:
+        _stats[name, hit] += 1
+    if not hit:
+        value = await build()
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def cache_stats():
+    with _stats_lock:
+        names = sorted({name for name, _ in _stats})
+        return [
+            {'name': name, 'hits': _stats[name, True], 'misses': _stats[name, False],
+             'hit_rate': _stats[name, True] / (_stats[name, True] + _stats[name, False])}
+            for name in names
+        ]
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def m2m_version_changed(sender, action, **kwargs):
+    # Both sides of the relation render the link, so both versions move
+    if action.startswith('post_'):
+        for field in sender._meta.fields:
+            if field.remote_field:
+                bump_model_version(field.related_model)
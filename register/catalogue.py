@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Project, ProjectTopic
+from .search import get_search_backend
+
+CATALOGUE_CACHE_KEY = 'register:proposed_catalogue'
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+
+def catalogue_queryset():
+    # Supervisors are joined in and topics fetched in one extra query, so the
+    # catalogue costs two queries no matter how many projects are listed.
+    return (
+        Project.objects.filter(status='Proposed')
+        .select_related('supervisor')
+        .prefetch_related(Prefetch('projecttopic_set', queryset=ProjectTopic.objects.order_by('id')))
+        .order_by('id')
+    )
+
+
+def catalogue_entry(project):
+    return {
+        'project': project,
+        'topics': list(project.projecttopic_set.all()),
+    }
+
+
+def build_proposed_catalogue():
+    return [catalogue_entry(project) for project in catalogue_queryset()]
+
+
+def get_proposed_catalogue():
+    catalogue = cache.get(CATALOGUE_CACHE_KEY)
+    if catalogue is None:
+        catalogue = build_proposed_catalogue()
+        cache.set(CATALOGUE_CACHE_KEY, catalogue, CATALOGUE_CACHE_TIMEOUT)
+    return catalogue
+
+
+def invalidate_proposed_catalogue(**kwargs):
+    cache.delete(CATALOGUE_CACHE_KEY)
+
+
+def search_catalogue(catalogue, query):
+    # Rank the cached catalogue by the search index instead of re-querying projects
+    ranking = {pk: position for position, pk in enumerate(get_search_backend().search(query))}
+    matches = [entry for entry in catalogue if entry['project'].id in ranking]
+    return sorted(matches, key=lambda entry: ranking[entry['project'].id])
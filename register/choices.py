@@ -0,0 +1,63 @@
+import threading
+
+from django.forms.models import ModelChoiceIterator
+
+from .caching import bump_version, get_version
+
+# In-process copies of choice lists as {name: (version, choices)}. The version
+# lives in the shared cache so a change in one process reaches the others.
+_choices = {}
+_lock = threading.Lock()
+
+
+def choices_version(*names):
+    return '.'.join(get_version(name) or '' for name in names)
+
+
+def cached_choices(name, queryset, label_from_instance):
+    version = get_version(name)
+    entry = _choices.get(name)
+    if entry is None or entry[0] != version:
+        choices = [(obj.pk, label_from_instance(obj)) for obj in queryset]
+        with _lock:
+            entry = _choices[name] = (version, choices)
+    return entry[1]
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def cached(self):
+        return cached_choices(self.field.choices_cache_name, self.queryset, self.field.label_from_instance)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from self.cached()
+
+    def __len__(self):
+        return len(self.cached()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.cached())
+
+
+class CachedChoicesMixin:
+    """
+    Serves a model choice field's options from the in-process cache instead of
+    querying on every render. Submitted values are still checked against the
+    database, as a single IN lookup for multiple choice fields.
+    """
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, *args, choices_cache_name, **kwargs):
+        self.choices_cache_name = choices_cache_name
+        super().__init__(*args, **kwargs)
+
+
+def invalidate_choices(name):
+    def receiver(sender, **kwargs):
+        bump_version(name)
+    return receiver
+
+
+TOPIC_CHOICES = 'project_topics'
+SUPERVISOR_CHOICES = 'supervisors'
@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def deleted_key(model):
+    return f'register:deleted:{model._meta.label_lower}'
+
+
+def model_deleted(sender, **kwargs):
+    cache.set(deleted_key(sender), time.time(), None)
+
+
+def last_deleted(models):
+    """
+    When a row of any of ``models`` was last deleted. A forgotten time counts
+    as now, so losing the cache can only cost a full response.
+    """
+    keys = [deleted_key(model) for model in models]
+    times = cache.get_many(keys)
+    for key in keys:
+        if key not in times:
+            cache.add(key, time.time(), None)
+            times[key] = cache.get(key)
+    return max(times.values(), default=None)
+
+
+async def alast_deleted(models):
+    keys = [deleted_key(model) for model in models]
+    times = await cache.aget_many(keys)
+    for key in keys:
+        if key not in times:
+            await cache.aadd(key, time.time(), None)
+            times[key] = await cache.aget(key)
+    return max(times.values(), default=None)
+
+
+def combine(rows, deleted):
+    # Rows of the list itself plus the Project rows it is filtered through
+    return {
+        'last_modified': max((row['last_modified'] for row in rows if row['last_modified']), default=None),
+        'count': ':'.join(str(row['count']) for row in rows),
+        'deleted': deleted,
+    }
+
+
+def list_validator(queryset, filtered_by=None, models=()):
+    """
+    The newest ``updated_at`` and the row count of ``queryset`` and of the
+    ``filtered_by`` rows that select it, one query each, plus the last delete
+    from ``models``.
+
+    The timestamp moves on inserts and updates and the count on deletes, so
+    together they change whenever the listed rows do. Last-Modified also
+    needs the delete time, as a delete leaves the newest ``updated_at`` alone.
+    """
+    rows = [
+        rows.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        for rows in (queryset, filtered_by) if rows is not None
+    ]
+    return combine(rows, last_deleted(models))
+
+
+async def alist_validator(queryset, filtered_by=None, models=()):
+    rows = [
+        await rows.order_by().aaggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        for rows in (queryset, filtered_by) if rows is not None
+    ]
+    return combine(rows, await alast_deleted(models))
+
+
+def list_validators(request, format, validator):
+    """The quoted ETag and Last-Modified timestamp for a list response built from ``validator``."""
+    last_modified = validator['last_modified']
+    # Different pages and formats of the same rows need different tags
+    etag = hashlib.md5(
+        f'{request.get_full_path()}:{format}:'
+        f'{last_modified and last_modified.isoformat()}:{validator["count"]}'.encode()
+    ).hexdigest()
+    timestamps = [last_modified.timestamp() if last_modified else None, validator['deleted']]
+    timestamp = max((int(value) for value in timestamps if value is not None), default=None)
+    return quote_etag(etag), timestamp
+
+
+def set_validators(response, etag, timestamp):
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Answers If-None-Match and If-Modified-Since on list endpoints with a 304
+    from the validator query alone, before anything is serialized.
+    """
+
+    def list_response(self, queryset, serializer_class, filtered_by=None):
+        validator = list_validator(queryset, filtered_by, self.cache_models)
+        etag, timestamp = list_validators(self.request, self.request.accepted_renderer.format, validator)
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().list_response(queryset, serializer_class)
+        return set_validators(response, etag, timestamp)
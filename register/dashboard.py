@@ -0,0 +1,123 @@
+from django.core.cache import cache
+
+from .caching import aget_version, bump_version, get_version, invalidate_on_commit
+from .models import Notification, Project, Student
+
+# Bumped after bulk writes that send no signals, dropping every record at once
+DASHBOARDS = 'student_dashboards'
+DASHBOARD_TIMEOUT = 60 * 60
+DASHBOARD_NOTIFICATIONS = 10
+PROJECT_FIELDS = ('id', 'title', 'description', 'required_skills', 'status', 'updated_at')
+SUPERVISOR_FIELDS = ('name', 'surname', 'email', 'department', 'telephone_number')
+
+
+def dashboard_key(user_id, version):
+    return f'register:student_dashboard:{version}:{user_id}'
+
+
+def project_queryset(user):
+    return (
+        Project.objects.filter(proposed_by__user_id=user.id)
+        .values(*PROJECT_FIELDS, *(f'supervisor__{field}' for field in SUPERVISOR_FIELDS), 'supervisor_id')
+    )
+
+
+def notification_queryset(user):
+    return (
+        Notification.objects.filter(user_id=user.id, read=False).order_by('-created_at', '-id')
+        .values('id', 'message', 'created_at')[:DASHBOARD_NOTIFICATIONS]
+    )
+
+
+def make_dashboard(project, notifications):
+    if project is not None:
+        supervisor = {field: project.pop(f'supervisor__{field}') for field in SUPERVISOR_FIELDS}
+        project['supervisor'] = supervisor if project.pop('supervisor_id') is not None else None
+    return {'project': project, 'notifications': notifications}
+
+
+def build_dashboard(user):
+    return make_dashboard(project_queryset(user).first(), list(notification_queryset(user)))
+
+
+async def abuild_dashboard(user):
+    return make_dashboard(
+        await project_queryset(user).afirst(),
+        [notification async for notification in notification_queryset(user)],
+    )
+
+
+def get_student_dashboard(user):
+    """
+    The student's project, its supervisor and their latest unread notifications
+    as one cached record, rebuilt after any of them changes.
+    """
+    key = dashboard_key(user.id, get_version(DASHBOARDS))
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, DASHBOARD_TIMEOUT)
+    return dashboard
+
+
+async def aget_student_dashboard(user):
+    key = dashboard_key(user.id, await aget_version(DASHBOARDS))
+    dashboard = await cache.aget(key)
+    if dashboard is None:
+        dashboard = await abuild_dashboard(user)
+        await cache.aset(key, dashboard, DASHBOARD_TIMEOUT)
+    return dashboard
+
+
+def invalidate_dashboards(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        invalidate_on_commit(
+            lambda: cache.delete_many([dashboard_key(user_id, get_version(DASHBOARDS)) for user_id in user_ids])
+        )
+
+
+def invalidate_all_dashboards():
+    bump_version(DASHBOARDS)
+
+
+def student_user_ids(student_ids):
+    student_ids = {student_id for student_id in student_ids if student_id is not None}
+    if not student_ids:
+        return []
+    return Student.objects.filter(id__in=student_ids).values_list('user_id', flat=True)
+
+
+def project_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The project may be moving away from another student, whose record goes too.
+    # Their user comes from the stored state read once in stats.project_saving.
+    previous = getattr(instance, '_stored_state', None)
+    user_ids = [previous and previous['proposed_by__user_id']]
+    if 'proposed_by' in instance._state.fields_cache and instance.proposed_by is not None:
+        user_ids.append(instance.proposed_by.user_id)
+    else:
+        user_ids.extend(student_user_ids([instance.proposed_by_id]))
+    invalidate_dashboards(user_ids)
+
+
+def project_transitioned(sender, project_id, previous_proposed_by=None, **kwargs):
+    user_ids = list(Project.objects.filter(id=project_id).values_list('proposed_by__user_id', flat=True))
+    invalidate_dashboards(user_ids + list(student_user_ids([previous_proposed_by])))
+
+
+def projects_transitioned(sender, project_ids, **kwargs):
+    invalidate_dashboards(Project.objects.filter(id__in=project_ids).values_list('proposed_by__user_id', flat=True))
+
+
+def student_changed(sender, instance, **kwargs):
+    invalidate_dashboards([instance.user_id])
+
+
+def supervisor_changed(sender, instance, **kwargs):
+    # Supervisor details are copied into the records of their students
+    invalidate_dashboards(
+        Project.objects.filter(supervisor=instance, proposed_by__isnull=False)
+        .values_list('proposed_by__user_id', flat=True)
+    )
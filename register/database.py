@@ -0,0 +1,22 @@
+from django.conf import settings
+
+SQLITE_PRAGMAS = (
+    # Safe with WAL, fsyncs only at checkpoints
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=20000',
+)
+
+# Readers no longer block the writer and the writer no longer blocks readers.
+# The mode is stored in the database file, so it is switched once per file.
+WAL_PRAGMA = 'PRAGMA journal_mode=WAL'
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = SQLITE_PRAGMAS
+    if getattr(settings, 'SQLITE_WAL', True):
+        pragmas = (WAL_PRAGMA,) + pragmas
+    with connection.cursor() as cursor:
+        for pragma in pragmas:
+            cursor.execute(pragma)
@@ -0,0 +1,34 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+
+
+def role_required(role):
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # RoleMiddleware has already loaded request.user, login_required
+                # would load it a second time through request.auser()
+                if not request.user.is_authenticated:
+                    return redirect_to_login(request.get_full_path())
+                if getattr(request, role, None) is None:
+                    return redirect('unauthorised')
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @login_required
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if getattr(request, role, None) is None:
+                return redirect('unauthorised')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+supervisor_required = role_required('supervisor')
+student_required = role_required('student')
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.core.exceptions import ValidationError
 
+from .choices import CachedChoicesMixin, TOPIC_CHOICES, SUPERVISOR_CHOICES
 from .models import Supervisor, Student, Project, ProjectTopic
 
 
@@ -23,13 +24,25 @@ class ProjectTopicForm(forms.ModelForm):
             raise ValidationError("Description must be 1000 characters or fewer.")
         return description
 
+class CachedModelChoiceField(CachedChoicesMixin, forms.ModelChoiceField):
+    pass
+
+class CachedModelMultipleChoiceField(CachedChoicesMixin, forms.ModelMultipleChoiceField):
+    pass
+
 class ProjectProposalForm(forms.ModelForm):
-    project_topics = forms.ModelMultipleChoiceField(
-        queryset=ProjectTopic.objects.all(),
+    project_topics = CachedModelMultipleChoiceField(
+        queryset=ProjectTopic.objects.order_by('id'),
+        choices_cache_name=TOPIC_CHOICES,
         widget=forms.CheckboxSelectMultiple,
         required=True,
         label="Select Project Topics"
     )
+    supervisor = CachedModelChoiceField(
+        queryset=Supervisor.objects.select_related('user').order_by('id'),
+        choices_cache_name=SUPERVISOR_CHOICES,
+        required=False,
+    )
 
     class Meta:
         model = Project
@@ -47,6 +60,28 @@ class ProjectProposalForm(forms.ModelForm):
             raise ValidationError("Description must be 1000 characters or fewer.")
         return description
 
+class ProjectPreferenceForm(forms.Form):
+    def __init__(self, *args, choices=5, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Build the choice list once rather than one query per field
+        projects = Project.objects.filter(status='Proposed', proposed_by__isnull=True).order_by('title')
+        options = [('', '---------')] + [(project.id, project.title) for project in projects]
+        self.rank_fields = []
+        for rank in range(1, choices + 1):
+            name = f'choice_{rank}'
+            self.fields[name] = forms.TypedChoiceField(
+                choices=options, coerce=int, empty_value=None, required=rank == 1, label=f'Choice {rank}'
+            )
+            self.rank_fields.append(name)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        ranked = [cleaned_data[name] for name in self.rank_fields if cleaned_data.get(name)]
+        if len(ranked) != len(set(ranked)):
+            raise ValidationError("Each project can only be ranked once.")
+        cleaned_data['ranked_projects'] = ranked
+        return cleaned_data
+
 class ProjectRequestForm(forms.ModelForm):
     class Meta:
         model = Project
@@ -70,3 +105,7 @@ class StudentForm(UserCreationForm):
     class Meta:
         model = User
         fields = ['username', 'first_name', 'last_name', 'email', 'password1', 'password2']
+
+class BulkImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSONL with one object per line')
+    dry_run = forms.BooleanField(required=False, help_text='Only validate the rows')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the work factor taken from
+    settings.PASSWORD_PBKDF2_ITERATIONS.
+
+    It keeps the stock algorithm name, so existing hashes stay valid, and any
+    hash made with a different count is redone at the user's next login by
+    the usual must_update check.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
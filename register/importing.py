@@ -0,0 +1,312 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .models import Supervisor, Student, Project, ProjectTopic
+from .seeding import refresh_derived_data
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_rows(file, format):
+    """Yield ``(line number, row dict)`` from an open text file without loading it all."""
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as error:
+                yield line_number, error
+    else:
+        raise ValueError(f'Unknown import format {format!r}, expected one of {", ".join(FORMATS)}')
+
+
+def format_for(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def _setup_worker():
+    # Needed when the pool spawns fresh interpreters rather than forking
+    django.setup()
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+class BaseImporter:
+    """
+    Validates rows a chunk at a time and writes each chunk with bulk_create
+    in its own transaction. Bad rows are reported and skipped, a chunk the
+    database rejects is reported as a whole, and the import carries on.
+    """
+    model = None
+    fields = ()
+    required = ()
+    # {field: model} checked against the database and earlier rows in bulk
+    unique = {}
+
+    def __init__(self, batch_size=1000, workers=1, dry_run=False):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dry_run = dry_run
+        self.pool = None
+        self.seen = {field: set() for field in self.unique}
+
+    def run(self, rows):
+        result = ImportResult()
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_setup_worker)
+        try:
+            rows = iter(rows)
+            while chunk := list(islice(rows, self.batch_size)):
+                self.import_chunk(chunk, result)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+        if result.created and not self.dry_run:
+            refresh_derived_data()
+        return result
+
+    def import_chunk(self, chunk, result):
+        valid = []
+        for line, row in chunk:
+            if not isinstance(row, dict):
+                result.add_error(line, f'Not a row: {row}')
+                continue
+            missing = [field for field in self.required if not _text(row, field)]
+            if missing:
+                result.add_error(line, f'Missing {", ".join(missing)}')
+                continue
+            try:
+                valid.append((line, row, self.build(row)))
+            except ValidationError as error:
+                result.add_error(line, '; '.join(error.messages))
+        valid = self.check_unique(valid, result)
+        valid = self.resolve(valid, result)
+        if not valid:
+            return
+        if self.dry_run:
+            self.mark_seen(valid)
+            result.created += len(valid)
+            return
+        # Anything slow happens here, outside the transaction holding the write lock
+        self.prepare(valid)
+        try:
+            with transaction.atomic():
+                self.save(valid)
+        except DatabaseError as error:
+            # Nothing was written, so later rows may still use these values
+            for line, _, _ in valid:
+                result.add_error(line, f'Not saved, the batch failed: {error}')
+        else:
+            self.mark_seen(valid)
+            result.created += len(valid)
+
+    def build(self, row):
+        instance = self.model(**{field: _text(row, field) for field in self.fields})
+        instance.full_clean(exclude=self.clean_exclude(), validate_unique=False)
+        return instance
+
+    def clean_exclude(self):
+        return []
+
+    def unique_value(self, instance, field):
+        return getattr(instance, field)
+
+    def check_unique(self, valid, result):
+        # Values already in the database or saved from earlier chunks
+        taken = {}
+        for field, model in self.unique.items():
+            values = {self.unique_value(instance, field) for _, _, instance in valid}
+            taken[field] = self.seen[field] | set(
+                model.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True)
+            )
+        kept = []
+        for line, row, instance in valid:
+            values = {field: self.unique_value(instance, field) for field in self.unique}
+            clash = next((field for field, value in values.items() if value in taken[field]), None)
+            if clash is not None:
+                result.add_error(line, f'{clash} {values[clash]!r} already exists')
+                continue
+            # Only a row passing every field claims its values for the rows after it
+            for field, value in values.items():
+                taken[field].add(value)
+            kept.append((line, row, instance))
+        return kept
+
+    def mark_seen(self, valid):
+        for field in self.unique:
+            self.seen[field].update(self.unique_value(instance, field) for _, _, instance in valid)
+
+    def resolve(self, valid, result):
+        return valid
+
+    def prepare(self, valid):
+        pass
+
+    def save(self, valid):
+        self.model.objects.bulk_create([instance for _, _, instance in valid])
+
+
+class AccountImporter(BaseImporter):
+    """Creates the User with its profile, hashing passwords in a process pool when there are workers."""
+
+    def build(self, row):
+        user = User(username=_text(row, 'username'), email=_text(row, 'email'))
+        user.full_clean(exclude=['password'], validate_unique=False)
+        profile = super().build(row)
+        profile.pending_user = user
+        profile.raw_password = _text(row, 'password') or None
+        return profile
+
+    def clean_exclude(self):
+        return ['user']
+
+    def unique_value(self, instance, field):
+        if field == 'username':
+            return instance.pending_user.username
+        return getattr(instance, field)
+
+    def hash_passwords(self, passwords):
+        # Accounts without a password get an unusable one, which costs nothing
+        to_hash = [password for password in passwords if password]
+        if self.pool is not None and len(to_hash) > 1:
+            chunksize = max(1, len(to_hash) // (self.workers * 4))
+            hashed = iter(list(self.pool.map(make_password, to_hash, chunksize=chunksize)))
+        else:
+            hashed = iter([make_password(password) for password in to_hash])
+        return [next(hashed) if password else make_password(None) for password in passwords]
+
+    def prepare(self, valid):
+        profiles = [instance for _, _, instance in valid]
+        hashes = self.hash_passwords([profile.raw_password for profile in profiles])
+        for profile, password_hash in zip(profiles, hashes):
+            profile.pending_user.password = password_hash
+
+    def save(self, valid):
+        profiles = [instance for _, _, instance in valid]
+        users = [profile.pending_user for profile in profiles]
+        User.objects.bulk_create(users)
+        for profile, user in zip(profiles, users):
+            profile.user = user
+        self.model.objects.bulk_create(profiles)
+
+
+class StudentImporter(AccountImporter):
+    model = Student
+    fields = ('name', 'surname', 'email', 'sussex_id', 'course')
+    required = ('username', 'name', 'surname', 'email', 'sussex_id', 'course')
+    unique = {'username': User, 'email': Student, 'sussex_id': Student}
+
+
+class SupervisorImporter(AccountImporter):
+    model = Supervisor
+    fields = ('name', 'surname', 'email', 'sussex_id', 'department', 'telephone_number')
+    required = ('username', 'name', 'surname', 'email', 'sussex_id', 'department', 'telephone_number')
+    unique = {'username': User, 'email': Supervisor, 'sussex_id': Supervisor}
+
+    def build(self, row):
+        profile = super().build(row)
+        capacity = _text(row, 'capacity')
+        if capacity:
+            profile.capacity = self.model._meta.get_field('capacity').clean(capacity, profile)
+        return profile
+
+
+class TopicImporter(BaseImporter):
+    model = ProjectTopic
+    fields = ('title', 'description')
+    required = ('title',)
+
+
+class ProjectImporter(BaseImporter):
+    """
+    Projects name their supervisor and student by Sussex ID and their topics
+    by title, separated with semicolons.
+    """
+    model = Project
+    fields = ('title', 'description', 'required_skills', 'status')
+    required = ('title', 'supervisor')
+
+    def build(self, row):
+        row = {**row, 'status': _text(row, 'status') or 'Proposed'}
+        return super().build(row)
+
+    def clean_exclude(self):
+        return ['supervisor', 'proposed_by']
+
+    def resolve(self, valid, result):
+        supervisors = Supervisor.objects.in_bulk({_text(row, 'supervisor') for _, row, _ in valid}, field_name='sussex_id')
+        students = Student.objects.in_bulk(
+            {_text(row, 'proposed_by') for _, row, _ in valid if _text(row, 'proposed_by')}, field_name='sussex_id'
+        )
+        titles = {title for _, row, _ in valid for title in self.topic_titles(row)}
+        topics = {}
+        # Titles are not unique, the oldest topic with the title wins
+        for topic_id, title in ProjectTopic.objects.filter(title__in=titles).order_by('id').values_list('id', 'title'):
+            topics.setdefault(title, topic_id)
+
+        kept = []
+        for line, row, project in valid:
+            supervisor = supervisors.get(_text(row, 'supervisor'))
+            student_id = _text(row, 'proposed_by')
+            unknown = [title for title in self.topic_titles(row) if title not in topics]
+            if supervisor is None:
+                result.add_error(line, f'Unknown supervisor {_text(row, "supervisor")!r}')
+            elif student_id and student_id not in students:
+                result.add_error(line, f'Unknown student {student_id!r}')
+            elif unknown:
+                result.add_error(line, f'Unknown topics {", ".join(unknown)}')
+            else:
+                project.supervisor = supervisor
+                project.proposed_by = students.get(student_id)
+                project.topic_ids = [topics[title] for title in self.topic_titles(row)]
+                kept.append((line, row, project))
+        return kept
+
+    def topic_titles(self, row):
+        return [title.strip() for title in _text(row, 'topics').split(';') if title.strip()]
+
+    def save(self, valid):
+        projects = Project.objects.bulk_create([project for _, _, project in valid])
+        Through = ProjectTopic.projects.through
+        Through.objects.bulk_create(
+            Through(projecttopic_id=topic_id, project_id=project.id)
+            for project in projects for topic_id in project.topic_ids
+        )
+
+
+IMPORTERS = {
+    'students': StudentImporter,
+    'supervisors': SupervisorImporter,
+    'topics': TopicImporter,
+    'projects': ProjectImporter,
+}
+
+
+def import_file(kind, file, format, **options):
+    return IMPORTERS[kind](**options).run(read_rows(file, format))
@@ -0,0 +1,229 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Requests that matched no URL share one entry, so scanning random paths
+# cannot grow view_stats without bound
+UNRESOLVED_VIEW = '<unresolved>'
+
+_current = ContextVar('register_request_metrics', default=None)
+
+# Literals are stripped so queries that differ only by their parameters share a signature
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+
+def query_signature(sql):
+    signature = _LITERALS.sub('?', sql)
+    return _IN_LISTS.sub('(...)', signature)
+
+
+def setting(name, default):
+    return getattr(settings, f'INSTRUMENTATION_{name}', default)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.signatures = Counter()
+        self.slow_queries = []
+
+    def duplicates(self, threshold):
+        return {signature: count for signature, count in self.signatures.items() if count >= threshold}
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.sql_time += elapsed
+        metrics.signatures[query_signature(sql)] += 1
+        if elapsed * 1000 >= setting('SLOW_QUERY_MS', 100):
+            metrics.slow_queries.append((sql, elapsed))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed once per connection rather than per request, so queries the
+    # async ORM runs on its worker thread are counted too (the request's
+    # metrics travel there with the context)
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class _InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # Templates rendered from inside another one (crispy forms, includes
+        # through get_template) are already part of the outer render's time
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for the request being instrumented."""
+
+    def from_string(self, template_code):
+        return _InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _InstrumentedTemplate(super().get_template(template_name))
+
+
+class ViewStats:
+    """Running per-view totals for the current process, shown on the instrumentation admin page."""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.window = window
+        self.views = {}
+
+    def add(self, view, record):
+        with self.lock:
+            entry = self.views.get(view)
+            if entry is None:
+                entry = self.views[view] = {
+                    'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'template_ms': 0.0,
+                    'bytes': 0, 'slow_queries': 0, 'durations': deque(maxlen=self.window), 'duplicates': Counter(),
+                }
+            entry['requests'] += 1
+            entry['queries'] += record['queries']
+            entry['max_queries'] = max(entry['max_queries'], record['queries'])
+            entry['sql_ms'] += record['sql_ms']
+            entry['template_ms'] += record['template_ms']
+            entry['bytes'] += record['response_bytes'] or 0
+            entry['slow_queries'] += record['slow_queries']
+            entry['durations'].append(record['duration_ms'])
+            entry['duplicates'].update(record['duplicates'])
+
+    def summary(self):
+        with self.lock:
+            rows = []
+            for view, entry in self.views.items():
+                requests = entry['requests']
+                durations = sorted(entry['durations'])
+                rows.append({
+                    'view': view,
+                    'requests': requests,
+                    'p50_ms': durations[len(durations) // 2],
+                    'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                    'queries': entry['queries'] / requests,
+                    'max_queries': entry['max_queries'],
+                    'sql_ms': entry['sql_ms'] / requests,
+                    'template_ms': entry['template_ms'] / requests,
+                    'bytes': entry['bytes'] / requests,
+                    'slow_queries': entry['slow_queries'],
+                    'duplicates': entry['duplicates'].most_common(3),
+                })
+        return sorted(rows, key=lambda row: row['sql_ms'] * row['requests'], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+view_stats = ViewStats()
+
+
+class InstrumentationMiddleware:
+    """
+    Records query count, SQL time, repeated query signatures, template time
+    and response size for a sample of requests, per resolved view name.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= setting('SAMPLE_RATE', 1.0):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= setting('SAMPLE_RATE', 1.0):
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def finish(self, request, response, metrics, duration):
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED_VIEW
+        self.record(view, request, response, metrics, duration)
+
+    def record(self, view, request, response, metrics, duration):
+        threshold = setting('DUPLICATE_QUERY_THRESHOLD', 3)
+        duplicates = metrics.duplicates(threshold)
+        record = {
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': metrics.queries,
+            'sql_ms': round(metrics.sql_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            # Streamed bodies are produced after the view returns and are not measured
+            'response_bytes': None if response.streaming else len(response.content),
+            'duplicates': duplicates,
+            'slow_queries': len(metrics.slow_queries),
+        }
+        view_stats.add(view, record)
+
+        slow = duration * 1000 >= setting('SLOW_REQUEST_MS', 500)
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+        for sql, elapsed in metrics.slow_queries:
+            logger.warning(json.dumps({'view': view, 'slow_query_ms': round(elapsed * 1000, 2), 'sql': sql}))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from register.allocation import run_allocation
+
+
+class Command(BaseCommand):
+    help = 'Allocate proposed projects to students from their ranked preferences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compute the allocation without saving it')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for the tie-breaking lottery')
+
+    def handle(self, *args, **options):
+        assignment = run_allocation(dry_run=options['dry_run'], seed=options['seed'])
+        verb = 'Would allocate' if options['dry_run'] else 'Allocated'
+        self.stdout.write(f'{verb} {len(assignment)} projects')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from register import stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or check the materialized allocation statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every counter from Project')
+        parser.add_argument('--check', action='store_true', help='Compare the counters with live aggregates')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            counts = stats.rebuild()
+            self.stdout.write(f'Rebuilt {len(counts)} counters')
+        if options['check'] or not options['rebuild']:
+            differences = stats.check()
+            for (dimension, key, status), (stored, live) in sorted(differences.items()):
+                self.stdout.write(f'{dimension} {key!r} {status}: stored {stored}, live {live}')
+            if differences:
+                raise CommandError(f'{len(differences)} counters are out of date, run with --rebuild')
+            self.stdout.write('Allocation statistics are consistent')
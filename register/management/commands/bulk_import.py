@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from register.importing import IMPORTERS, FORMATS, format_for, import_file
+
+
+class Command(BaseCommand):
+    help = 'Import students, supervisors, topics or projects from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows validated and written per transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing passwords, 1 hashes in this process')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            file = open(path, newline='', encoding='utf-8-sig')
+        except OSError as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+        with file:
+            result = import_file(
+                options['kind'], file, options['format'] or format_for(path),
+                batch_size=options['batch_size'], workers=options['workers'], dry_run=options['dry_run'],
+            )
+        for line, message in sorted(result.errors):
+            self.stderr.write(f'line {line}: {message}')
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(f'{verb} {result.created} {options["kind"]}, {len(result.errors)} rows rejected')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from register.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8, help='Threads used for external delivery backends')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            batch_size=options['batch_size'],
+            threads=options['threads'],
+            max_attempts=options['max_attempts'],
+        )
+        while True:
+            stats = worker.drain()
+            processed = stats['delivered'] + stats['failed']
+            if processed:
+                rate = processed / stats['elapsed'] if stats['elapsed'] else processed
+                self.stdout.write(
+                    f"Delivered {stats['delivered']}, failed {stats['failed']} "
+                    f"in {stats['elapsed']:.2f}s ({rate:.0f} msg/s)"
+                )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
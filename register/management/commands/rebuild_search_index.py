@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from register.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the project full-text search index from scratch'
+
+    def handle(self, *args, **options):
+        count = get_search_backend().rebuild()
+        self.stdout.write(f'Indexed {count} projects')
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from register.seeding import seed, supervisor_username
+
+
+class Command(BaseCommand):
+    help = 'Generate supervisors, students, topics and projects for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supervisors', type=int, default=100)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--topics', type=int, default=50)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--requested', type=float, default=0.1,
+                            help='Share of projects already requested by a student')
+        parser.add_argument('--password', default='password', help='Password shared by every generated account')
+        parser.add_argument('--prefix', default='load', help='Prefix for the generated usernames')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed')
+
+    def handle(self, *args, **options):
+        if options['projects'] and not options['supervisors']:
+            raise CommandError('Projects need at least one supervisor')
+        if User.objects.filter(username=supervisor_username(options['prefix'], 0)).exists():
+            raise CommandError(f'Accounts with prefix {options["prefix"]!r} already exist, pick another --prefix')
+        counts = seed(
+            options['supervisors'], options['students'], options['topics'], options['projects'],
+            password=options['password'], requested=options['requested'], prefix=options['prefix'],
+            rng_seed=options['seed'],
+        )
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in counts.items()))
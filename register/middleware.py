@@ -0,0 +1,71 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+
+from .models import Supervisor, Student
+
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+
+def role_key(user_id):
+    return f'register:role:{user_id}'
+
+
+def resolve_roles(user):
+    """
+    The user's (supervisor, student) profiles, either of which may be None.
+
+    Looked up once and then served from the cache until the profile changes.
+    """
+    roles = cache.get(role_key(user.id))
+    if roles is None:
+        roles = (
+            Supervisor.objects.filter(user=user).first(),
+            Student.objects.filter(user=user).first(),
+        )
+        cache.set(role_key(user.id), roles, ROLE_CACHE_TIMEOUT)
+    return roles
+
+
+async def aresolve_roles(user):
+    roles = await cache.aget(role_key(user.id))
+    if roles is None:
+        roles = (
+            await Supervisor.objects.filter(user=user).afirst(),
+            await Student.objects.filter(user=user).afirst(),
+        )
+        await cache.aset(role_key(user.id), roles, ROLE_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_roles(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        cache.delete(role_key(instance.user_id))
+
+
+class RoleMiddleware:
+    """Sets request.supervisor and request.student for the logged in user."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.supervisor = request.student = None
+        if request.user.is_authenticated:
+            request.supervisor, request.student = resolve_roles(request.user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.supervisor = request.student = None
+        user = await request.auser()
+        # Swap the lazy request.user for the loaded one, otherwise the first
+        # template or decorator to touch it would query from the event loop
+        request.user = user
+        if user.is_authenticated:
+            request.supervisor, request.student = await aresolve_roles(user)
+        return await self.get_response(request)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('register', '0007_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supervisor',
+            name='capacity',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Most projects allocated to this supervisor, blank for no limit', null=True),
+        ),
+        migrations.CreateModel(
+            name='ProjectPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='register.project')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='register.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'rank'), name='preference_unique_rank'), models.UniqueConstraint(fields=('student', 'project'), name='preference_unique_project')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS register_project_fts "
+        "USING fts5(title, description, required_skills, topics, tokenize='porter unicode61')"
+    )
+    Project = apps.get_model('register', 'Project')
+    ProjectTopic = apps.get_model('register', 'ProjectTopic')
+    topics = {}
+    for project_id, title in ProjectTopic.projects.through.objects.values_list('project_id', 'projecttopic__title'):
+        topics.setdefault(project_id, []).append(title)
+    rows = [
+        (pk, title, description, skills, ' '.join(topics.get(pk, [])))
+        for pk, title, description, skills in Project.objects.values_list('id', 'title', 'description', 'required_skills')
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO register_project_fts (rowid, title, description, required_skills, topics) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS register_project_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('register', '0008_supervisor_capacity_projectpreference'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+def populate_statistics(apps, schema_editor):
+    Project = apps.get_model('register', 'Project')
+    AllocationStatistic = apps.get_model('register', 'AllocationStatistic')
+    counts = {}
+    rows = Project.objects.values('status', 'supervisor_id', 'supervisor__department').annotate(total=models.Count('id'))
+    for row in rows:
+        keys = [('status', '')]
+        if row['supervisor_id'] is not None:
+            keys += [('supervisor', str(row['supervisor_id'])), ('department', row['supervisor__department'] or '')]
+        for dimension, key in keys:
+            counts[dimension, key, row['status']] = counts.get((dimension, key, row['status']), 0) + row['total']
+    AllocationStatistic.objects.bulk_create(
+        AllocationStatistic(dimension=dimension, key=key, status=status, count=count)
+        for (dimension, key, status), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('register', '0009_project_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('supervisor', 'Supervisor'), ('department', 'Department')], max_length=10)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('Accepted', 'Accepted'), ('Proposed', 'Proposed'), ('Available', 'Available'), ('Requested', 'Requested'), ('Confirmed', 'Confirmed')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key', 'status'), name='statistic_unique_counter')],
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import User
 from django.core.validators import EmailValidator
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class Supervisor(models.Model):
@@ -11,6 +12,14 @@ class Supervisor(models.Model):
     sussex_id = models.CharField(max_length=20, unique=True)
     department = models.CharField(max_length=100)
     telephone_number = models.CharField(max_length=15)
+    capacity = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                help_text='Most projects allocated to this supervisor, blank for no limit')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='supervisor_updated_idx'),
+        ]
 
     def __str__(self):
         return self.user.username
@@ -22,6 +31,12 @@ class Student(models.Model):
     email = models.EmailField(unique=True,validators=[EmailValidator()],verbose_name='Email Address')
     sussex_id = models.CharField(max_length=20, unique=True)
     course = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='student_updated_idx'),
+        ]
 
     def __str__(self):
         return self.user.username
@@ -41,6 +56,19 @@ class Project(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     proposed_by = models.ForeignKey(Student, null=True, blank=True, on_delete=models.SET_NULL)
     supervisor = models.ForeignKey(Supervisor, null=True, blank=True, on_delete=models.SET_NULL)
+    # Proposed by the student rather than listed in the catalogue, rejecting it deletes it
+    student_proposal = models.BooleanField(default=False)
+    # auto_now only applies to save(), queryset updates have to set it themselves
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='project_status_idx'),
+            models.Index(fields=['supervisor', 'status'], name='project_supervisor_status_idx'),
+            models.Index(fields=['updated_at'], name='project_updated_idx'),
+            models.Index(fields=['supervisor', 'updated_at'], name='project_supervisor_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -57,5 +85,71 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at'], name='notification_user_read_idx'),
+            models.Index(fields=['user', '-created_at'], condition=models.Q(read=False),
+                         name='notification_unread_idx'),
+        ]
+
     def __str__(self):
         return f'Notification for {self.user.username}: {self.message}'
+
+
+class ProjectPreference(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'rank'], name='preference_unique_rank'),
+            models.UniqueConstraint(fields=['student', 'project'], name='preference_unique_project'),
+        ]
+
+    def __str__(self):
+        return f'{self.student} #{self.rank}: {self.project}'
+
+
+class AllocationStatistic(models.Model):
+    DIMENSION_CHOICES = [
+        ('status', 'Status'),
+        ('supervisor', 'Supervisor'),
+        ('department', 'Department')
+    ]
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=10, choices=Project.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key', 'status'], name='statistic_unique_counter'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension} {self.key} {self.status}: {self.count}'
+
+
+class NotificationOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Delivered', 'Delivered'),
+        ('Failed', 'Failed')
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    message = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    notification = models.OneToOneField(Notification, null=True, blank=True, on_delete=models.SET_NULL)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f'Outbox message for {self.user.username}: {self.message}'
@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .dashboard import invalidate_dashboards
+from .models import Notification
+from .pubsub import get_broker, notification_channel
+
+DASHBOARD_NOTIFICATION_LIMIT = 10
+UNREAD_COUNT_TIMEOUT = 60 * 60
+
+
+def unread_count_key(user_id):
+    return f'register:unread_notifications:{user_id}'
+
+
+def unread_count(user):
+    key = unread_count_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user=user, read=False).count()
+        cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+async def aunread_count(user):
+    key = unread_count_key(user.id)
+    count = await cache.aget(key)
+    if count is None:
+        count = await Notification.objects.filter(user=user, read=False).acount()
+        await cache.aset(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def unread_notifications(user, limit=DASHBOARD_NOTIFICATION_LIMIT):
+    return Notification.objects.filter(user=user, read=False).order_by('-created_at', '-id')[:limit]
+
+
+def latest_notifications(user, limit=DASHBOARD_NOTIFICATION_LIMIT):
+    return list(unread_notifications(user, limit))
+
+
+async def alatest_notifications(user, limit=DASHBOARD_NOTIFICATION_LIMIT):
+    return [notification async for notification in unread_notifications(user, limit)]
+
+
+def mark_read(user, ids=None):
+    # A single UPDATE for either every unread notification or just the given ids
+    notifications = Notification.objects.filter(user=user, read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    updated = notifications.update(read=True)
+    if updated:
+        cache.delete(unread_count_key(user.id))
+        invalidate_dashboards([user.id])
+    return updated
+
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def notifications_created(notifications):
+    # Also called directly after bulk_create, which does not send post_save
+    invalidate_dashboards(notification.user_id for notification in notifications if not notification.read)
+    for notification in notifications:
+        if notification.read:
+            continue
+        try:
+            cache.incr(unread_count_key(notification.user_id))
+        except ValueError:
+            # Nothing cached yet, the next read will count from the database
+            pass
+
+        # Push to any open notification streams once the row is actually committed
+        channel = notification_channel(notification.user_id)
+        payload = notification_payload(notification)
+        transaction.on_commit(lambda channel=channel, payload=payload: get_broker().publish(channel, payload))
+
+
+def notification_created(sender, instance, created, **kwargs):
+    if created:
+        notifications_created([instance])
+
+
+def notification_deleted(sender, instance, **kwargs):
+    cache.delete(unread_count_key(instance.user_id))
+    invalidate_dashboards([instance.user_id])
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification, NotificationOutbox
+from .notifications import notifications_created
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_notification(user, message):
+    # The request only writes the outbox row, delivery happens in the worker
+    entry = NotificationOutbox.objects.create(user=user, message=message)
+    if getattr(settings, 'NOTIFICATION_OUTBOX_AUTODISPATCH', False):
+        transaction.on_commit(schedule_dispatch)
+    return entry
+
+
+class OutboxWorker:
+    """
+    Delivers pending outbox rows in batches.
+
+    Every message becomes an in-app Notification (one bulk_create per batch)
+    and is then handed to each callable in settings.NOTIFICATION_DELIVERY_BACKENDS
+    on a thread pool, so slow email or webhook calls overlap. Rows that fail
+    are retried with exponential backoff until max_attempts is reached.
+    """
+
+    def __init__(self, batch_size=500, max_attempts=5, threads=8, backends=None, retry_delay=30, lease=300):
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.threads = threads
+        self.retry_delay = retry_delay
+        if backends is None:
+            backends = [import_string(path) for path in getattr(settings, 'NOTIFICATION_DELIVERY_BACKENDS', [])]
+        self.backends = backends
+
+    def claim(self):
+        now = timezone.now()
+        # skip_locked lets several workers share the table on databases with row locks
+        return list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending', available_at__lte=now)
+            .select_related('notification')
+            .order_by('id')[:self.batch_size]
+        )
+
+    def create_notifications(self, entries):
+        new_entries = [entry for entry in entries if entry.notification_id is None]
+        if not new_entries:
+            return
+        notifications = Notification.objects.bulk_create(
+            Notification(user_id=entry.user_id, message=entry.message) for entry in new_entries
+        )
+        for entry, notification in zip(new_entries, notifications):
+            entry.notification = notification
+        NotificationOutbox.objects.bulk_update(new_entries, ['notification'])
+        notifications_created(notifications)
+
+    def deliver_external(self, entry):
+        for backend in self.backends:
+            backend(entry.notification)
+
+    def run_once(self):
+        start = time.perf_counter()
+        with transaction.atomic():
+            entries = self.claim()
+            if not entries:
+                return {'delivered': 0, 'failed': 0, 'elapsed': time.perf_counter() - start}
+            # Lease the batch so other workers skip it while external delivery runs
+            # outside the transaction
+            NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+                available_at=timezone.now() + timedelta(seconds=self.lease)
+            )
+            self.create_notifications(entries)
+
+        delivered, failed = [], []
+        if self.backends:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                futures = [(entry, pool.submit(self.deliver_external, entry)) for entry in entries]
+                for entry, future in futures:
+                    error = future.exception()
+                    if error is None:
+                        delivered.append(entry)
+                    else:
+                        failed.append((entry, error))
+        else:
+            delivered = entries
+
+        with transaction.atomic():
+            NotificationOutbox.objects.filter(id__in=[entry.id for entry in delivered]).update(status='Delivered')
+            self.record_failures(failed)
+
+        stats = {'delivered': len(delivered), 'failed': len(failed), 'elapsed': time.perf_counter() - start}
+        logger.info('Outbox batch delivered=%(delivered)d failed=%(failed)d in %(elapsed).3fs', stats)
+        return stats
+
+    def record_failures(self, failed):
+        now = timezone.now()
+        for entry, error in failed:
+            entry.attempts += 1
+            entry.last_error = repr(error)
+            if entry.attempts >= self.max_attempts:
+                entry.status = 'Failed'
+            else:
+                entry.available_at = now + timedelta(seconds=self.retry_delay * 2 ** (entry.attempts - 1))
+            logger.warning('Outbox delivery %s failed (attempt %d): %r', entry.id, entry.attempts, error)
+        if failed:
+            NotificationOutbox.objects.bulk_update(
+                [entry for entry, _ in failed], ['attempts', 'last_error', 'status', 'available_at']
+            )
+
+    def drain(self):
+        totals = {'delivered': 0, 'failed': 0, 'elapsed': 0.0}
+        while True:
+            stats = self.run_once()
+            for key in totals:
+                totals[key] += stats[key]
+            if stats['delivered'] + stats['failed'] < self.batch_size:
+                return totals
+
+
+_dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notification-outbox')
+_dispatch_pending = threading.Event()
+
+
+def schedule_dispatch():
+    # Collapse bursts of commits into a single background drain
+    if not _dispatch_pending.is_set():
+        _dispatch_pending.set()
+        _dispatcher.submit(_dispatch)
+
+
+def _dispatch():
+    _dispatch_pending.clear()
+    try:
+        OutboxWorker().drain()
+    except Exception:
+        logger.exception('Background notification dispatch failed')
+    finally:
+        close_old_connections()
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+from .caching import cached
+
+
+class KeysetCursorPagination(CursorPagination):
+    # Pages are fetched with ``WHERE id > <cursor> ORDER BY id LIMIT n`` so every
+    # page costs the same no matter how deep into the table the client is.
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class CursorPaginatedMixin:
+    pagination_class = KeysetCursorPagination
+    # Writes to any of these models invalidate the cached pages, leave empty to
+    # serialize every request afresh
+    cache_models = ()
+
+    def paginated_response(self, queryset, serializer_class):
+        def build():
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(queryset, self.request, view=self)
+            serializer = serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+
+        if not self.cache_models:
+            return Response(build())
+        # The page links are absolute, so the host is part of the key too
+        data = cached(f'api:{type(self).__name__}', self.cache_models, build,
+                      vary_on=[self.request.build_absolute_uri()])
+        return Response(data)
+
+
+async def apaginate(request, queryset, serializer_class, paginator_class=KeysetCursorPagination):
+    """
+    One keyset page for a plain async view, with the same cursors, links and
+    payload as CursorPaginatedMixin so clients can use either endpoint.
+    """
+    paginator = paginator_class()
+    # The paginator only reads query_params from the DRF request
+    params = SimpleNamespace(query_params=request.GET)
+    page_size = paginator.get_page_size(params)
+    try:
+        cursor = paginator.decode_cursor(params)
+    except NotFound:
+        raise Http404(paginator.invalid_cursor_message)
+    paginator.base_url = request.build_absolute_uri()
+
+    reverse = cursor is not None and cursor.reverse
+    position = cursor.position if cursor is not None else None
+    queryset = queryset.order_by('-id' if reverse else 'id')
+    if position is not None:
+        queryset = queryset.filter(id__lt=position) if reverse else queryset.filter(id__gt=position)
+    rows = [row async for row in queryset[:page_size + 1]]
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    # Walking backwards the rows past the page are the previous ones
+    has_next = position is not None if reverse else has_more
+    has_previous = has_more if reverse else position is not None
+    return {
+        'next': paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(rows[-1].id)))
+        if rows and has_next else None,
+        'previous': paginator.encode_cursor(Cursor(offset=0, reverse=True, position=str(rows[0].id)))
+        if rows and has_previous else None,
+        'results': serializer_class(rows, many=True).data,
+    }
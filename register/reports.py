@@ -0,0 +1,118 @@
+import csv
+import tempfile
+from collections import defaultdict
+
+from django.db.models import Count, Q
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Supervisor, Student, Project
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+STATUSES = [status for status, _ in Project.STATUS_CHOICES]
+
+
+def status_field(status):
+    return f'{status.lower()}_count'
+
+
+def annotated_supervisors():
+    counts = {status_field(status): Count('project', filter=Q(project__status=status)) for status in STATUSES}
+    return Supervisor.objects.annotate(project_count=Count('project'), **counts).order_by('surname', 'name', 'id')
+
+
+def build_report():
+    """
+    Supervisors with their status counts and projects, and students with
+    their projects, in three queries however many rows there are.
+
+    Projects are fetched once and grouped in Python rather than prefetched,
+    so the query never carries tens of thousands of ids in an IN clause.
+    """
+    supervisors = list(annotated_supervisors())
+    students = list(Student.objects.order_by('surname', 'name', 'id'))
+
+    by_supervisor = defaultdict(list)
+    by_student = defaultdict(list)
+    projects = Project.objects.select_related('proposed_by').order_by('id')
+    for project in projects.iterator(chunk_size=5000):
+        if project.supervisor_id is not None:
+            by_supervisor[project.supervisor_id].append(project)
+        if project.proposed_by_id is not None:
+            by_student[project.proposed_by_id].append(project)
+
+    for supervisor in supervisors:
+        supervisor.report_projects = by_supervisor[supervisor.id]
+        supervisor.status_counts = [(status, getattr(supervisor, status_field(status))) for status in STATUSES]
+    for student in students:
+        student.report_projects = by_student[student.id]
+
+    return {
+        'supervisors': supervisors,
+        'students': students,
+        'statuses': STATUSES,
+    }
+
+
+def supervisor_rows():
+    yield ['Name', 'Surname', 'Department', 'Email', 'Projects'] + STATUSES
+    rows = annotated_supervisors().values_list(
+        'name', 'surname', 'department', 'email', 'project_count', *[status_field(status) for status in STATUSES]
+    )
+    yield from rows.iterator(chunk_size=5000)
+
+
+def project_rows():
+    yield ['Title', 'Status', 'Supervisor Name', 'Supervisor Surname', 'Student Name', 'Student Surname']
+    rows = Project.objects.order_by('id').values_list(
+        'title', 'status', 'supervisor__name', 'supervisor__surname', 'proposed_by__name', 'proposed_by__surname'
+    )
+    yield from rows.iterator(chunk_size=5000)
+
+
+def student_rows():
+    yield ['Name', 'Surname', 'Course', 'Email', 'Project', 'Status']
+    # Students without a project still get a row with blank project columns
+    rows = Student.objects.order_by('surname', 'name', 'id').values_list(
+        'name', 'surname', 'course', 'email', 'project__title', 'project__status'
+    )
+    yield from rows.iterator(chunk_size=5000)
+
+
+REPORT_TABLES = {
+    'supervisors': supervisor_rows,
+    'projects': project_rows,
+    'students': student_rows,
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_response(table):
+    writer = csv.writer(Echo())
+    rows = (writer.writerow(['' if value is None else value for value in row]) for row in REPORT_TABLES[table]())
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{table}-report.csv"'
+    return response
+
+
+def xlsx_response(table):
+    # openpyxl's write-only mode keeps one row in memory, the finished zip is
+    # spooled to a temporary file and streamed from there
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(table.title())
+    for row in REPORT_TABLES[table]():
+        sheet.append(list(row))
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=f'{table}-report.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+REPLICA_DATABASE = 'replica'
+
+_use_replica = ContextVar('register_use_replica', default=False)
+
+
+def has_replica():
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send reads made inside the block to the read replica, when one is configured."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _streamed_from_replica(content):
+    with use_replica():
+        yield from content
+
+
+async def _astreamed_from_replica(content):
+    with use_replica():
+        async for chunk in content:
+            yield chunk
+
+
+def replica_view(view_func):
+    """
+    Serve a read-only view from the replica.
+
+    Streaming responses run their queries after the view has returned, so the
+    content iterator is wrapped to keep reading from the replica as well.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            with use_replica():
+                response = await view_func(*args, **kwargs)
+            if getattr(response, 'streaming', False) and response.is_async:
+                response.streaming_content = _astreamed_from_replica(response.streaming_content)
+            return response
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            response = view_func(*args, **kwargs)
+        if getattr(response, 'streaming', False) and not response.is_async:
+            response.streaming_content = _streamed_from_replica(response.streaming_content)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to the replica only inside
+    use_replica(), so a request never reads back its own writes from a
+    replica that may be lagging behind.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and has_replica():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DATABASE:
+            return False
+        return None
@@ -0,0 +1,170 @@
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Project
+
+FTS_TABLE = 'register_project_fts'
+
+
+def topic_text(project):
+    return ' '.join(topic.title for topic in project.projecttopic_set.all())
+
+
+class DatabaseSearchBackend:
+    """Plain LIKE matching, used where no full-text index is available."""
+
+    def index(self, projects):
+        pass
+
+    def remove(self, project_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, query, limit=None):
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        projects = Project.objects.all()
+        for term in terms:
+            projects = projects.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) |
+                Q(required_skills__icontains=term) | Q(projecttopic__title__icontains=term)
+            )
+        ids = projects.distinct().order_by('id').values_list('id', flat=True)
+        return list(ids[:limit] if limit else ids)
+
+
+def fts_connection():
+    # The index lives beside the projects it covers, never on a read replica
+    return connections[router.db_for_write(Project)]
+
+
+class SQLiteFTSBackend:
+    """
+    SQLite FTS5 index over project title, description, skills and topic titles.
+
+    Rows are keyed by project id and kept in step by the signal handlers below,
+    results are ranked with bm25 weighting title matches highest.
+    """
+    weights = (10.0, 1.0, 4.0, 3.0)
+
+    def index(self, projects):
+        rows = [
+            (project.pk, project.title, project.description, project.required_skills, topic_text(project))
+            for project in projects
+        ]
+        if not rows:
+            return
+        with fts_connection().cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, required_skills, topics) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, project_ids):
+        with fts_connection().cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in project_ids])
+
+    def rebuild(self):
+        with fts_connection().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        count = 0
+        projects = Project.objects.prefetch_related('projecttopic_set').order_by('id')
+        batch = []
+        for project in projects.iterator(chunk_size=2000):
+            batch.append(project)
+            if len(batch) == 2000:
+                self.index(batch)
+                count += len(batch)
+                batch = []
+        self.index(batch)
+        return count + len(batch)
+
+    def match_expression(self, query):
+        # Every word must match, as a prefix so partial words still find results
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit=None):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        sql = (
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}), rowid'
+        )
+        params = [expression]
+        if limit:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with fts_connection().cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.PROJECT_SEARCH_BACKEND)()
+    return _backend
+
+
+def search_projects(query, queryset=None, limit=None):
+    """Projects matching ``query`` in rank order, optionally restricted to ``queryset``."""
+    ids = get_search_backend().search(query, limit=None if queryset is not None else limit)
+    if queryset is None:
+        queryset = Project.objects.all()
+    found = queryset.in_bulk(ids)
+    projects = [found[pk] for pk in ids if pk in found]
+    return projects[:limit] if limit else projects
+
+
+def reindex_projects(project_ids):
+    get_search_backend().index(Project.objects.filter(id__in=project_ids).prefetch_related('projecttopic_set'))
+
+
+def project_saved(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+
+def project_deleted(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+def topic_saved(sender, instance, created, **kwargs):
+    if not created:
+        reindex_projects(instance.projects.values_list('id', flat=True))
+
+
+def topic_deleting(sender, instance, **kwargs):
+    instance._search_project_ids = list(instance.projects.values_list('id', flat=True))
+
+
+def topic_deleted(sender, instance, **kwargs):
+    reindex_projects(getattr(instance, '_search_project_ids', []))
+
+
+def topics_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # project.projecttopic_set.set() arrives reversed with the project as instance
+    if isinstance(instance, Project):
+        if action.startswith('post_'):
+            get_search_backend().index([instance])
+        return
+    if action == 'pre_clear':
+        instance._search_project_ids = list(instance.projects.values_list('id', flat=True))
+    elif action == 'post_clear':
+        reindex_projects(getattr(instance, '_search_project_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        reindex_projects(pk_set)
@@ -0,0 +1,102 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import stats
+from .catalogue import invalidate_proposed_catalogue
+from .dashboard import invalidate_all_dashboards
+from .caching import bump_model_version, bump_version
+from .choices import TOPIC_CHOICES, SUPERVISOR_CHOICES
+from .models import Supervisor, Student, Project, ProjectTopic
+from .search import get_search_backend
+
+DEPARTMENTS = ['Informatics', 'Engineering', 'Mathematics', 'Physics', 'Psychology']
+SKILLS = ['Python', 'Java', 'Machine learning', 'Databases', 'Networking', 'Statistics', 'Web development']
+
+
+def supervisor_username(prefix, i):
+    return f'{prefix}supervisor{i}'
+
+
+def student_username(prefix, i):
+    return f'{prefix}student{i}'
+
+
+def refresh_derived_data():
+    # bulk_create sends no signals, so bring the derived data up to date in one go
+    stats.rebuild()
+    get_search_backend().rebuild()
+    invalidate_proposed_catalogue()
+    invalidate_all_dashboards()
+    bump_version(TOPIC_CHOICES)
+    bump_version(SUPERVISOR_CHOICES)
+    for model in (Supervisor, Student, Project, ProjectTopic):
+        bump_model_version(model)
+
+
+def seed(supervisors, students, topics, projects, password='password', requested=0.1, prefix='load', rng_seed=2024):
+    """
+    Bulk create a synthetic cohort for load testing.
+
+    Every account shares ``password``, hashed once. A ``requested`` share of
+    the projects is already requested by the students at the end of the list,
+    so supervisors have proposals to manage while the first students are
+    still free to request one.
+    """
+    rng = random.Random(rng_seed)
+    password_hash = make_password(password)
+    requested_count = min(int(projects * requested), students)
+
+    with transaction.atomic():
+        supervisor_users = User.objects.bulk_create(
+            User(username=supervisor_username(prefix, i), password=password_hash) for i in range(supervisors)
+        )
+        supervisor_rows = Supervisor.objects.bulk_create(
+            Supervisor(user=user, name='Super', surname=f'Visor {i}', email=f'{user.username}@sussex.ac.uk',
+                       sussex_id=f'SUP-{user.username}', department=DEPARTMENTS[i % len(DEPARTMENTS)],
+                       telephone_number='01273000000', capacity=rng.randint(3, 8))
+            for i, user in enumerate(supervisor_users)
+        )
+        student_users = User.objects.bulk_create(
+            (User(username=student_username(prefix, i), password=password_hash) for i in range(students)),
+            batch_size=5000,
+        )
+        student_rows = Student.objects.bulk_create(
+            (Student(user=user, name='Stu', surname=f'Dent {i}', email=f'{user.username}@sussex.ac.uk',
+                     sussex_id=f'STU-{user.username}', course='Computer Science')
+             for i, user in enumerate(student_users)),
+            batch_size=5000,
+        )
+        topic_rows = ProjectTopic.objects.bulk_create(
+            ProjectTopic(title=f'Topic {i}', description=f'{rng.choice(SKILLS)} research area') for i in range(topics)
+        )
+
+        requesters = student_rows[len(student_rows) - requested_count:]
+        project_rows = Project.objects.bulk_create(
+            (Project(title=f'Project {i}', description=f'{rng.choice(SKILLS)} project number {i}',
+                     required_skills=', '.join(rng.sample(SKILLS, 2)),
+                     status='Requested' if i < requested_count else 'Proposed',
+                     supervisor=supervisor_rows[i % len(supervisor_rows)],
+                     proposed_by=requesters[i] if i < requested_count else None)
+             for i in range(projects)),
+            batch_size=5000,
+        )
+        if topic_rows:
+            Through = ProjectTopic.projects.through
+            Through.objects.bulk_create(
+                (Through(projecttopic=topic, project=project)
+                 for project in project_rows
+                 for topic in rng.sample(topic_rows, min(2, len(topic_rows)))),
+                batch_size=5000,
+            )
+
+    refresh_derived_data()
+    return {
+        'supervisors': len(supervisor_rows),
+        'students': len(student_rows),
+        'topics': len(topic_rows),
+        'projects': len(project_rows),
+        'requested': requested_count,
+    }
@@ -0,0 +1,86 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+
+from . import conditional, dashboard, stats
+from .choices import invalidate_choices, TOPIC_CHOICES, SUPERVISOR_CHOICES
+
+from .caching import bump_model_version, m2m_version_changed
+from .database import configure_sqlite
+from .instrumentation import install_query_recorder
+from .catalogue import invalidate_proposed_catalogue
+from .middleware import invalidate_roles
+from .models import Supervisor, Student, Project, ProjectTopic, Notification
+from .transitions import project_transitioned, projects_transitioned
+from .search import project_saved, project_deleted, topic_saved, topic_deleting, topic_deleted, topics_changed
+from .notifications import notification_created, notification_deleted
+
+
+def connect_signals():
+    connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
+    connection_created.connect(install_query_recorder, dispatch_uid='install_query_recorder')
+
+    # Versioned fragment and payload caches, see register.caching
+    for model in (Project, ProjectTopic, Supervisor, Student):
+        post_save.connect(bump_model_version, sender=model, dispatch_uid=f'version_save_{model.__name__}')
+        post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'version_delete_{model.__name__}')
+    m2m_changed.connect(m2m_version_changed, sender=ProjectTopic.projects.through, dispatch_uid='version_topics_changed')
+    project_transitioned.connect(bump_model_version, dispatch_uid='version_transitioned')
+    projects_transitioned.connect(bump_model_version, dispatch_uid='version_batch_transitioned')
+
+    # Anything shown on the proposed projects catalogue drops the cached copy
+    for model in (Project, ProjectTopic, Supervisor):
+        post_save.connect(invalidate_proposed_catalogue, sender=model, dispatch_uid=f'catalogue_save_{model.__name__}')
+        post_delete.connect(invalidate_proposed_catalogue, sender=model, dispatch_uid=f'catalogue_delete_{model.__name__}')
+    m2m_changed.connect(invalidate_proposed_catalogue, sender=ProjectTopic.projects.through,
+                        dispatch_uid='catalogue_topics_changed')
+    project_transitioned.connect(invalidate_proposed_catalogue, dispatch_uid='catalogue_transitioned')
+    projects_transitioned.connect(invalidate_proposed_catalogue, dispatch_uid='catalogue_batch_transitioned')
+
+    # Deletes leave MAX(updated_at) alone, Last-Modified on the lists needs their time too
+    for model in (Project, Supervisor, Student):
+        post_delete.connect(conditional.model_deleted, sender=model, dispatch_uid=f'deleted_{model.__name__}')
+
+    post_save.connect(notification_created, sender=Notification, dispatch_uid='unread_notification_count')
+    post_delete.connect(notification_deleted, sender=Notification, dispatch_uid='unread_notification_count_delete')
+
+    # Keep the project search index in step with the text it covers
+    post_save.connect(project_saved, sender=Project, dispatch_uid='search_project_saved')
+    post_delete.connect(project_deleted, sender=Project, dispatch_uid='search_project_deleted')
+    post_save.connect(topic_saved, sender=ProjectTopic, dispatch_uid='search_topic_saved')
+    pre_delete.connect(topic_deleting, sender=ProjectTopic, dispatch_uid='search_topic_deleting')
+    post_delete.connect(topic_deleted, sender=ProjectTopic, dispatch_uid='search_topic_deleted')
+    m2m_changed.connect(topics_changed, sender=ProjectTopic.projects.through, dispatch_uid='search_topics_changed')
+
+    # Incrementally maintained allocation statistics. project_saving also keeps
+    # the stored row for the dashboard receivers below.
+    pre_save.connect(stats.project_saving, sender=Project, dispatch_uid='stats_project_saving')
+    post_save.connect(stats.project_saved, sender=Project, dispatch_uid='stats_project_saved')
+    pre_delete.connect(stats.project_deleting, sender=Project, dispatch_uid='stats_project_deleting')
+    post_delete.connect(stats.project_deleted, sender=Project, dispatch_uid='stats_project_deleted')
+    project_transitioned.connect(stats.project_transitioned, dispatch_uid='stats_project_transitioned')
+    projects_transitioned.connect(stats.projects_transitioned, dispatch_uid='stats_projects_transitioned')
+    pre_save.connect(stats.supervisor_saving, sender=Supervisor, dispatch_uid='stats_supervisor_saving')
+    post_save.connect(stats.supervisor_saved, sender=Supervisor, dispatch_uid='stats_supervisor_saved')
+    pre_delete.connect(stats.supervisor_deleting, sender=Supervisor, dispatch_uid='stats_supervisor_deleting')
+
+    # Precomputed student dashboards, see register.dashboard
+    post_save.connect(dashboard.project_changed, sender=Project, dispatch_uid='dashboard_project_saved')
+    post_delete.connect(dashboard.project_changed, sender=Project, dispatch_uid='dashboard_project_deleted')
+    project_transitioned.connect(dashboard.project_transitioned, dispatch_uid='dashboard_project_transitioned')
+    projects_transitioned.connect(dashboard.projects_transitioned, dispatch_uid='dashboard_projects_transitioned')
+    post_save.connect(dashboard.student_changed, sender=Student, dispatch_uid='dashboard_student_saved')
+    post_delete.connect(dashboard.student_changed, sender=Student, dispatch_uid='dashboard_student_deleted')
+    post_save.connect(dashboard.supervisor_changed, sender=Supervisor, dispatch_uid='dashboard_supervisor_saved')
+    # Before the delete, while their projects still point at them
+    pre_delete.connect(dashboard.supervisor_changed, sender=Supervisor, dispatch_uid='dashboard_supervisor_deleting')
+
+    # Versioned proposal form choices
+    for model, name in ((ProjectTopic, TOPIC_CHOICES), (Supervisor, SUPERVISOR_CHOICES)):
+        receiver = invalidate_choices(name)
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'choices_save_{name}')
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'choices_delete_{name}')
+
+    # Cached request.supervisor / request.student profiles
+    for model in (Supervisor, Student):
+        post_save.connect(invalidate_roles, sender=model, dispatch_uid=f'roles_save_{model.__name__}')
+        post_delete.connect(invalidate_roles, sender=model, dispatch_uid=f'roles_delete_{model.__name__}')
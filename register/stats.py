@@ -0,0 +1,209 @@
+from collections import Counter
+
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .models import AllocationStatistic, Project, Supervisor
+
+
+def counter_keys(status, supervisor_id, department):
+    yield 'status', '', status
+    if supervisor_id is not None:
+        yield 'supervisor', str(supervisor_id), status
+        yield 'department', department or '', status
+
+
+# Counters written per statement, keeping the OR and CASE lists well inside
+# SQLite's expression depth and variable limits
+APPLY_BATCH_SIZE = 200
+
+
+def deltas_for(status, supervisor_id, department, delta):
+    return Counter({key: delta for key in counter_keys(status, supervisor_id, department)})
+
+
+def apply(deltas):
+    """Add ``deltas`` to the counters with one INSERT and one UPDATE per batch, however many there are."""
+    keys = [key for key, delta in deltas.items() if delta]
+    with transaction.atomic():
+        for start in range(0, len(keys), APPLY_BATCH_SIZE):
+            batch = keys[start:start + APPLY_BATCH_SIZE]
+            # Missing counters start at zero, existing ones are left alone
+            AllocationStatistic.objects.bulk_create(
+                [AllocationStatistic(dimension=dimension, key=key, status=status) for dimension, key, status in batch],
+                ignore_conflicts=True,
+            )
+            matches = [Q(dimension=dimension, key=key, status=status) for dimension, key, status in batch]
+            AllocationStatistic.objects.filter(reduce(or_, matches)).update(count=F('count') + Case(
+                *(When(match, then=Value(deltas[key])) for match, key in zip(matches, batch)), default=Value(0),
+            ))
+
+
+def on_commit(func):
+    # The counters are a few hot rows every writer touches, updating them
+    # after the caller commits keeps their locks out of its transaction
+    transaction.on_commit(func)
+
+
+def record(deltas):
+    deltas = Counter({key: delta for key, delta in deltas.items() if delta})
+    if deltas:
+        on_commit(lambda: apply(deltas))
+
+
+def department_of(supervisor_id):
+    if supervisor_id is None:
+        return None
+    return Supervisor.objects.filter(id=supervisor_id).values_list('department', flat=True).first()
+
+
+def live_counts():
+    """The same counters computed with GROUP BY over Project, for rebuilds and checks."""
+    counts = Counter()
+    rows = Project.objects.values('status', 'supervisor_id', 'supervisor__department').annotate(total=Count('id'))
+    for row in rows:
+        for key in counter_keys(row['status'], row['supervisor_id'], row['supervisor__department']):
+            counts[key] += row['total']
+    return counts
+
+
+def stored_counts():
+    return Counter({
+        (dimension, key, status): count
+        for dimension, key, status, count in AllocationStatistic.objects.values_list('dimension', 'key', 'status', 'count')
+        if count
+    })
+
+
+def rebuild():
+    counts = live_counts()
+    with transaction.atomic():
+        AllocationStatistic.objects.all().delete()
+        AllocationStatistic.objects.bulk_create(
+            AllocationStatistic(dimension=dimension, key=key, status=status, count=count)
+            for (dimension, key, status), count in counts.items()
+        )
+    return counts
+
+
+def check():
+    """Differences between the stored counters and live aggregates as {key: (stored, live)}."""
+    stored, live = stored_counts(), live_counts()
+    return {key: (stored[key], live[key]) for key in set(stored) | set(live) if stored[key] != live[key]}
+
+
+def counts_by(dimension):
+    # A handful of rows per dimension, however many projects there are
+    result = {}
+    for key, status, count in AllocationStatistic.objects.filter(dimension=dimension).values_list('key', 'status', 'count'):
+        result.setdefault(key, {})[status] = count
+    return result
+
+
+STORED_FIELDS = ('status', 'supervisor_id', 'supervisor__department', 'proposed_by__user_id')
+
+
+def stored_state(instance):
+    # Read from the database rather than trusting the instance, which may be
+    # stale after queryset updates or refresh_from_db(). The student dashboards
+    # use the same row, so a save costs one SELECT for both.
+    return Project.objects.filter(pk=instance.pk).values(*STORED_FIELDS).first()
+
+
+def previous_deltas(previous):
+    if previous is None or not previous['status']:
+        return Counter()
+    return deltas_for(previous['status'], previous['supervisor_id'], previous['supervisor__department'], -1)
+
+
+def project_saving(sender, instance, raw=False, **kwargs):
+    instance._stored_state = None if raw or instance._state.adding else stored_state(instance)
+
+
+def project_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stored_state', None)
+    if previous is None or (previous['status'], previous['supervisor_id']) != (instance.status, instance.supervisor_id):
+        deltas = previous_deltas(previous)
+        if instance.status:
+            # The supervisor usually stays put, so their department is already known
+            if previous is not None and previous['supervisor_id'] == instance.supervisor_id:
+                department = previous['supervisor__department']
+            else:
+                department = department_of(instance.supervisor_id)
+            deltas.update(deltas_for(instance.status, instance.supervisor_id, department, 1))
+        record(deltas)
+
+
+def project_deleting(sender, instance, **kwargs):
+    instance._stored_state = stored_state(instance)
+
+
+def project_deleted(sender, instance, **kwargs):
+    record(previous_deltas(getattr(instance, '_stored_state', None)))
+
+
+def transition_deltas(rows, from_status, to_status):
+    deltas = Counter()
+    for supervisor_id, department, total in rows:
+        deltas.update(deltas_for(from_status, supervisor_id, department, -total))
+        deltas.update(deltas_for(to_status, supervisor_id, department, total))
+    return deltas
+
+
+def project_transitioned(sender, project_id, from_status, to_status, **kwargs):
+    rows = Project.objects.filter(id=project_id).values_list('supervisor_id', 'supervisor__department')
+    record(transition_deltas([(*row, 1) for row in rows], from_status, to_status))
+
+
+def projects_transitioned(sender, project_ids, from_status, to_status, **kwargs):
+    # A whole batch moves with one GROUP BY and one write per counter batch
+    rows = Project.objects.filter(id__in=project_ids) \
+        .values_list('supervisor_id', 'supervisor__department').annotate(total=Count('id'))
+    record(transition_deltas(rows, from_status, to_status))
+
+
+def supervisor_counts(supervisor_id):
+    return AllocationStatistic.objects.filter(dimension='supervisor', key=str(supervisor_id)).exclude(count=0) \
+        .values_list('status', 'count')
+
+
+def supervisor_saving(sender, instance, raw=False, **kwargs):
+    instance._stats_department = None
+    if not raw and not instance._state.adding:
+        instance._stats_department = Supervisor.objects.filter(pk=instance.pk).values_list('department', flat=True).first()
+
+
+def move_supervisor(supervisor_id, from_department, to_department):
+    # Read when it runs, after any earlier deltas from the same transaction
+    deltas = Counter()
+    for status, count in supervisor_counts(supervisor_id):
+        if from_department is not None:
+            deltas[('department', from_department, status)] -= count
+        if to_department is not None:
+            deltas[('department', to_department, status)] += count
+    apply(deltas)
+
+
+def supervisor_saved(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_stats_department', None)
+    if not created and not raw and previous is not None and previous != instance.department:
+        # Move this supervisor's counters across to the new department
+        supervisor_id, department = instance.id, instance.department or ''
+        on_commit(lambda: move_supervisor(supervisor_id, previous, department))
+
+
+def supervisor_deleting(sender, instance, **kwargs):
+    # Projects are detached with SET_NULL, which bypasses their signals
+    supervisor_id, department = instance.id, instance.department or ''
+
+    def remove():
+        with transaction.atomic():
+            move_supervisor(supervisor_id, department, None)
+            AllocationStatistic.objects.filter(dimension='supervisor', key=str(supervisor_id)).delete()
+
+    on_commit(remove)
@@ -0,0 +1,61 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for non-streamed responses such as errors
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_line(row) for row in rows).encode(self.charset)
+
+
+def ndjson_line(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+def stream_ndjson(queryset, serializer_class, chunk_size=2000):
+    serializer = serializer_class()
+
+    def rows():
+        # One serializer instance is reused and rows are pulled from the
+        # database in chunks, so memory stays flat regardless of table size.
+        for instance in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+            yield ndjson_line(serializer.to_representation(instance))
+
+    return StreamingHttpResponse(rows(), content_type=NDJSONRenderer.media_type)
+
+
+def astream_ndjson(queryset, serializer_class, chunk_size=2000):
+    serializer = serializer_class()
+
+    async def rows():
+        async for instance in queryset.order_by('pk').aiterator(chunk_size=chunk_size):
+            yield ndjson_line(serializer.to_representation(instance))
+
+    return StreamingHttpResponse(rows(), content_type=NDJSONRenderer.media_type)
+
+
+def wants_ndjson(request):
+    # Content negotiation for the plain async views, DRF does this for the others
+    return request.GET.get('format') == NDJSONRenderer.format or \
+        NDJSONRenderer.media_type in request.headers.get('Accept', '')
+
+
+class NDJSONExportMixin:
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+    export_chunk_size = 2000
+
+    def list_response(self, queryset, serializer_class):
+        if self.request.accepted_renderer.format == NDJSONRenderer.format:
+            return stream_ndjson(queryset, serializer_class, chunk_size=self.export_chunk_size)
+        return self.paginated_response(queryset, serializer_class)
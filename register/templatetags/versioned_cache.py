@@ -0,0 +1,38 @@
+from django import template
+
+from register.caching import cached
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, name, models, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.models = models
+        self.vary_on = vary_on
+
+    def render(self, context):
+        models = self.models.resolve(context).split()
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return cached(self.name.resolve(context), models, lambda: self.nodelist.render(context), vary_on=vary_on)
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """
+    Cache the enclosed fragment until any of the listed models is written::
+
+        {% versioned_cache "accepted_projects" "register.Project register.Student" request.supervisor.id %}
+            ...
+        {% endversioned_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f'{bits[0]} takes a name, a list of models and optional vary_on values')
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    return VersionedCacheNode(
+        nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -1,3 +1,1335 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import stats
+from .allocation import allocate, run_allocation
+from .forms import ProjectProposalForm
+from .caching import cache_stats, get_version, reset_cache_stats
+from .dashboard import DASHBOARDS, dashboard_key, get_student_dashboard
+from .hashers import TunablePBKDF2PasswordHasher
+from .instrumentation import RequestMetrics, query_signature, view_stats
+from .models import Supervisor, Student, Project, ProjectTopic, Notification, NotificationOutbox, ProjectPreference
+from .outbox import OutboxWorker
+from .reports import build_report, openpyxl
+from .routers import ReplicaRouter, _use_replica, use_replica
+from .search import get_search_backend
+from .transitions import InvalidTransition, transition
+from .pubsub import get_broker, notification_channel
+
+
+def clear_caches():
+    # The default cache and the state cache holding sessions, buckets and idempotency keys
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def make_supervisor(username='supervisor', **kwargs):
+    user = User.objects.create_user(username=username)
+    defaults = {
+        'name': 'Super',
+        'surname': 'Visor',
+        'email': f'{username}@sussex.ac.uk',
+        'sussex_id': f'SUP-{username}',
+        'department': 'Informatics',
+        'telephone_number': '01273000000',
+    }
+    defaults.update(kwargs)
+    return Supervisor.objects.create(user=user, **defaults)
+
+
+def make_student(username='student', **kwargs):
+    user = User.objects.create_user(username=username)
+    defaults = {
+        'name': 'Stu',
+        'surname': 'Dent',
+        'email': f'{username}@sussex.ac.uk',
+        'sussex_id': f'STU-{username}',
+        'course': 'Computer Science',
+    }
+    defaults.update(kwargs)
+    return Student.objects.create(user=user, **defaults)
+
+
+def make_project(supervisor, title='Project', status='Proposed', **kwargs):
+    defaults = {
+        'description': f'{title} description',
+        'required_skills': 'Python',
+    }
+    defaults.update(kwargs)
+    return Project.objects.create(title=title, status=status, supervisor=supervisor, **defaults)
+
+
+class ProposedProjectsCatalogueTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+
+    def add_projects(self, count):
+        for i in range(count):
+            supervisor = make_supervisor(username=f'supervisor{Project.objects.count()}')
+            project = make_project(supervisor, title=f'Project {Project.objects.count()}')
+            topic = ProjectTopic.objects.create(title=f'Topic for {project.title}', description='Topic')
+            topic.projects.add(project)
+
+    def test_query_count_does_not_grow_with_projects(self):
+        self.add_projects(2)
+        # session, user, the two role lookups, the student dashboard's project and
+        # notifications, projects + supervisors, topics
+        with self.assertNumQueries(8):
+            self.client.get(reverse('proposed_projects'))
+
+        self.add_projects(20)
+        # roles and the dashboard now come from the cache
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('proposed_projects'))
+        self.assertEqual(len(response.context['projects_with_topics']), 22)
+
+    def test_catalogue_is_served_from_cache(self):
+        self.add_projects(3)
+        self.client.get(reverse('proposed_projects'))
+        # session and user, the cached fragment is served without loading the catalogue
+        with self.assertNumQueries(2), mock.patch('register.views.get_proposed_catalogue') as catalogue:
+            response = self.client.get(reverse('proposed_projects'))
+        self.assertContains(response, 'Topic for Project 0')
+        catalogue.assert_not_called()
+
+    def test_cache_is_invalidated_on_change(self):
+        self.add_projects(1)
+        self.client.get(reverse('proposed_projects'))
+
+        project = Project.objects.get()
+        project.title = 'Renamed Project'
+        project.save()
+        self.assertContains(self.client.get(reverse('proposed_projects')), 'Renamed Project')
+
+        topic = ProjectTopic.objects.create(title='Brand New Topic', description='Topic')
+        topic.projects.add(project)
+        self.assertContains(self.client.get(reverse('proposed_projects')), 'Brand New Topic')
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        for i in range(25):
+            make_project(self.supervisor, title=f'Project {i}')
+
+    def test_walks_every_project_once_in_id_order(self):
+        url = reverse('project-list', args=['all']) + '?page_size=10'
+        seen = []
+        pages = 0
+        while url:
+            # the conditional GET validator and the page itself
+            with self.assertNumQueries(2):
+                data = self.client.get(url).json()
+            seen.extend(project['id'] for project in data['results'])
+            url = data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, list(Project.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('project-list', args=['all']), {'page_size': 5000})
+        self.assertEqual(len(response.json()['results']), 25)
+        self.assertIsNone(response.json()['next'])
+
+    def test_filtered_listings_are_paginated(self):
+        student = make_student()
+        Project.objects.filter(title='Project 0').update(proposed_by=student)
+        response = self.client.get(reverse('supervisor-list', args=[student.id]))
+        self.assertEqual([s['id'] for s in response.json()['results']], [self.supervisor.id])
+        response = self.client.get(reverse('student-list', args=[self.supervisor.id]))
+        self.assertEqual([s['id'] for s in response.json()['results']], [student.id])
+
+
+class NDJSONExportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        for i in range(5):
+            make_project(self.supervisor, title=f'Project {i}')
+
+    def test_streams_one_json_object_per_line(self):
+        response = self.client.get(reverse('project-list', args=['all']), {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['title'] for row in rows], [f'Project {i}' for i in range(5)])
+
+    def test_accept_header_selects_stream(self):
+        response = self.client.get(reverse('supervisor-list', args=['all']), HTTP_ACCEPT='application/x-ndjson')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.supervisor.id])
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.user = self.supervisor.user
+        self.client.force_login(self.user)
+        for i in range(15):
+            Notification.objects.create(user=self.user, message=f'Message {i}')
+
+    def test_dashboard_shows_latest_notifications_and_count(self):
+        response = self.client.get(reverse('supervisor_home'))
+        self.assertEqual(len(response.context['notifications']), 10)
+        self.assertEqual(response.context['notifications'][0].message, 'Message 14')
+        self.assertEqual(response.context['unread_count'], 15)
+        self.assertContains(response, '<title>Supervisor Home</title>')
+        self.assertContains(response, 'new EventSource', count=1)
+
+    def test_unread_count_is_kept_up_to_date(self):
+        self.client.get(reverse('supervisor_home'))
+        Notification.objects.create(user=self.user, message='Another')
+        response = self.client.get(reverse('supervisor_home'))
+        self.assertEqual(response.context['unread_count'], 16)
+
+    def test_mark_selected_as_read(self):
+        ids = list(Notification.objects.values_list('id', flat=True)[:3])
+        self.client.get(reverse('supervisor_home'))
+        with self.assertNumQueries(3):
+            self.client.post(reverse('mark_notifications_read'), {'notification_ids': ids})
+        self.assertEqual(Notification.objects.filter(read=False).count(), 12)
+        self.assertEqual(self.client.get(reverse('supervisor_home')).context['unread_count'], 12)
+
+    def test_mark_all_as_read_only_touches_own_notifications(self):
+        other = make_supervisor(username='other')
+        Notification.objects.create(user=other.user, message='Not yours')
+        self.client.post(reverse('mark_notifications_read'), {'all': ''})
+        self.assertEqual(Notification.objects.filter(read=False).get().user, other.user)
+
+    def test_history_is_paginated(self):
+        for i in range(20):
+            Notification.objects.create(user=self.user, message=f'Old {i}', read=True)
+        response = self.client.get(reverse('notification_history'), {'page': 2})
+        self.assertEqual(len(response.context['page']), 10)
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+
+    async def test_stream_pushes_published_notifications(self):
+        await self.async_client.aforce_login(self.supervisor.user)
+        response = await self.async_client.get(reverse('notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        next_event = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        get_broker().publish(notification_channel(self.supervisor.user_id), {'id': 1, 'message': 'Hello'})
+        event = await asyncio.wait_for(next_event, timeout=5)
+        self.assertEqual(event, b'event: notification\ndata: {"id": 1, "message": "Hello"}\n\n')
+        await stream.aclose()
+
+    def test_stream_requires_asgi(self):
+        self.client.force_login(self.supervisor.user)
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 501)
+
+    def test_new_notification_is_published_on_commit(self):
+        with mock.patch.object(get_broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = Notification.objects.create(user=self.supervisor.user, message='Hello')
+        publish.assert_called_once_with(notification_channel(self.supervisor.user_id), {
+            'id': notification.id,
+            'message': 'Hello',
+            'created_at': notification.created_at.isoformat(),
+        })
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+        self.project = make_project(self.supervisor)
+        self.client.force_login(self.student.user)
+
+    def test_request_only_enqueues(self):
+        self.client.post(reverse('request_project', args=[self.project.id]))
+        self.assertFalse(Notification.objects.exists())
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.user, self.supervisor.user)
+        self.assertEqual(entry.status, 'Pending')
+
+    def test_worker_delivers_batch_with_bulk_create(self):
+        for i in range(20):
+            NotificationOutbox.objects.create(user=self.supervisor.user, message=f'Message {i}')
+        # claim, lease, bulk insert notifications, link outbox rows, mark delivered
+        # plus two savepoint pairs
+        with self.assertNumQueries(9):
+            stats = OutboxWorker(backends=[]).run_once()
+        self.assertEqual(stats['delivered'], 20)
+        self.assertEqual(Notification.objects.filter(user=self.supervisor.user).count(), 20)
+        self.assertFalse(NotificationOutbox.objects.exclude(status='Delivered').exists())
+
+    def test_failed_external_delivery_is_retried_without_duplicates(self):
+        calls = []
+
+        def flaky(notification):
+            calls.append(notification.id)
+            if len(calls) == 1:
+                raise ConnectionError('webhook down')
+
+        NotificationOutbox.objects.create(user=self.supervisor.user, message='Hello')
+        worker = OutboxWorker(backends=[flaky], retry_delay=0, lease=0)
+        with self.assertLogs('register.outbox', 'WARNING'):
+            self.assertEqual(worker.run_once()['failed'], 1)
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('Pending', 1))
+
+        self.assertEqual(worker.run_once()['delivered'], 1)
+        self.assertEqual(NotificationOutbox.objects.get().status, 'Delivered')
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        def broken(notification):
+            raise ConnectionError('webhook down')
+
+        NotificationOutbox.objects.create(user=self.supervisor.user, message='Hello')
+        worker = OutboxWorker(backends=[broken], retry_delay=0, lease=0, max_attempts=2)
+        with self.assertLogs('register.outbox', 'WARNING'):
+            worker.run_once()
+            worker.run_once()
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('Failed', 2))
+        self.assertIn('webhook down', entry.last_error)
+
+
+class ProjectTransitionTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.project = make_project(self.supervisor)
+        self.student = make_student()
+
+    def test_illegal_transition_is_rejected(self):
+        with self.assertRaises(InvalidTransition):
+            transition(self.project.id, 'Proposed', 'Confirmed')
+
+    def test_transition_only_applies_from_expected_status(self):
+        self.assertTrue(transition(self.project.id, 'Proposed', 'Requested', proposed_by=self.student))
+        self.assertFalse(transition(self.project.id, 'Proposed', 'Requested', proposed_by=make_student('late')))
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.status, self.project.proposed_by), ('Requested', self.student))
+
+    def test_second_request_is_refused(self):
+        self.client.force_login(self.student.user)
+        self.client.post(reverse('request_project', args=[self.project.id]))
+        other = make_student('other')
+        self.client.force_login(other.user)
+        response = self.client.post(reverse('request_project', args=[self.project.id]), follow=True)
+        self.assertContains(response, 'already been requested')
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.proposed_by, self.student)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_accept_and_reject_need_a_requested_project(self):
+        self.client.force_login(self.supervisor.user)
+        self.client.post(reverse('manage_proposals'), {'project_id': self.project.id, 'reject_project': ''})
+        self.assertTrue(Project.objects.filter(id=self.project.id).exists())
+
+        transition(self.project.id, 'Proposed', 'Requested', proposed_by=self.student)
+        self.client.post(reverse('manage_proposals'), {'project_id': self.project.id, 'accept_project': ''})
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status, 'Accepted')
+
+    def test_rejected_catalogue_project_goes_back_on_offer(self):
+        transition(self.project.id, 'Proposed', 'Requested', proposed_by=self.student)
+        self.client.force_login(self.supervisor.user)
+        self.client.post(reverse('manage_proposals'), {'project_id': self.project.id, 'reject_project': ''})
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.status, self.project.proposed_by), ('Proposed', None))
+
+        proposal = make_project(self.supervisor, title='Own idea', status='Requested', proposed_by=self.student,
+                                student_proposal=True)
+        self.client.post(reverse('manage_proposals'), {'project_id': proposal.id, 'reject_project': ''})
+        self.assertFalse(Project.objects.filter(id=proposal.id).exists())
+
+    def test_supervisors_only_manage_their_own_proposals(self):
+        transition(self.project.id, 'Proposed', 'Requested', proposed_by=self.student)
+        self.client.force_login(make_supervisor('other').user)
+        response = self.client.post(reverse('manage_proposals'), {'project_id': self.project.id, 'accept_project': ''})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(list(self.client.get(reverse('manage_proposals')).context['notifications']), [])
+        response = self.client.post(reverse('manage_proposals'), {'project_id': 'x', 'accept_project': ''})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Project.objects.get().status, 'Requested')
+
+
+class ConcurrentRequestTests(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_exactly_one_concurrent_request_wins(self):
+        project = make_project(make_supervisor())
+        students = Student.objects.bulk_create(
+            Student(name='S', surname=str(i), email=f's{i}@sussex.ac.uk', sussex_id=f'S{i}', course='CS')
+            for i in range(200)
+        )
+
+        def request(student):
+            try:
+                return transition(project.id, 'Proposed', 'Requested', proposed_by=student)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(request, students))
+
+        self.assertEqual(results.count(True), 1)
+        project.refresh_from_db()
+        self.assertEqual(project.status, 'Requested')
+        self.assertEqual(project.proposed_by, students[results.index(True)])
+
+
+class AllocationEngineTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_project_goes_to_student_who_ranked_it_higher(self):
+        preferences = {'a': ['p1', 'p2'], 'b': ['p2', 'p1']}
+        supervisors = {'p1': 's', 'p2': 's'}
+        self.assertEqual(allocate(preferences, supervisors, {}, seed=1), {'a': 'p1', 'b': 'p2'})
+
+        preferences = {'a': ['p1', 'p2'], 'b': ['p1']}
+        lottery = {'a': 0.9, 'b': 0.1}
+        self.assertEqual(allocate(preferences, supervisors, {}, lottery=lottery), {'a': 'p2', 'b': 'p1'})
+
+    def test_supervisor_capacity_is_respected(self):
+        preferences = {'a': ['p1', 'q1'], 'b': ['p2', 'q1'], 'c': ['p3']}
+        supervisors = {'p1': 's', 'p2': 's', 'p3': 's', 'q1': 't'}
+        lottery = {'a': 0.1, 'b': 0.2, 'c': 0.3}
+        assignment = allocate(preferences, supervisors, {'s': 2}, lottery=lottery)
+        self.assertEqual(assignment, {'a': 'p1', 'b': 'p2'})
+
+        # 'a' loses p1 to the capacity limit once 'c' who ranked p3 first arrives earlier in the lottery
+        lottery = {'a': 0.3, 'b': 0.2, 'c': 0.1}
+        assignment = allocate(preferences, supervisors, {'s': 2}, lottery=lottery)
+        self.assertEqual(assignment, {'a': 'q1', 'b': 'p2', 'c': 'p3'})
+
+    def test_run_allocation_writes_results(self):
+        supervisor = make_supervisor(capacity=1)
+        first = make_project(supervisor, title='First')
+        second = make_project(supervisor, title='Second')
+        alice, bob = make_student('alice'), make_student('bob')
+        ProjectPreference.objects.create(student=alice, project=first, rank=1)
+        ProjectPreference.objects.create(student=bob, project=first, rank=1)
+        ProjectPreference.objects.create(student=bob, project=second, rank=2)
+
+        assignment = run_allocation(seed=3)
+        self.assertEqual(len(assignment), 1)
+        (student_id, project_id), = assignment.items()
+        self.assertEqual(project_id, first.id)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.proposed_by_id), ('Accepted', student_id))
+        self.assertEqual(Project.objects.get(id=second.id).status, 'Proposed')
+
+    def test_student_can_submit_preferences(self):
+        supervisor = make_supervisor()
+        first, second = make_project(supervisor, title='First'), make_project(supervisor, title='Second')
+        student = make_student()
+        self.client.force_login(student.user)
+        response = self.client.post(reverse('project_preferences'), {'choice_1': second.id, 'choice_2': second.id})
+        self.assertFormError(response.context['form'], None, 'Each project can only be ranked once.')
+
+        self.client.post(reverse('project_preferences'), {'choice_1': second.id, 'choice_2': first.id})
+        self.assertEqual(
+            list(ProjectPreference.objects.filter(student=student).order_by('rank').values_list('project_id', flat=True)),
+            [second.id, first.id]
+        )
+
+
+class ProjectSearchTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.robots = make_project(self.supervisor, title='Swarm robotics',
+                                   description='Coordinating many small robots')
+        self.compilers = make_project(self.supervisor, title='Optimising compilers',
+                                      description='Register allocation for a toy language')
+        self.robots_skills = make_project(self.supervisor, title='Web platform', description='Django app',
+                                          required_skills='Robotics background')
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(get_search_backend().search('robot'), [self.robots.id, self.robots_skills.id])
+
+    def test_index_follows_saves_topics_and_deletes(self):
+        self.compilers.title = 'Optimising robot compilers'
+        self.compilers.save()
+        self.assertIn(self.compilers.id, get_search_backend().search('robot'))
+
+        topic = ProjectTopic.objects.create(title='Machine learning', description='Topic')
+        topic.projects.add(self.robots)
+        self.assertEqual(get_search_backend().search('machine learning'), [self.robots.id])
+        topic.title = 'Vision'
+        topic.save()
+        self.assertEqual(get_search_backend().search('machine'), [])
+        self.assertEqual(get_search_backend().search('vision'), [self.robots.id])
+
+        self.robots.delete()
+        self.assertNotIn(self.robots.id, get_search_backend().search('robot'))
+
+    def test_catalogue_and_api_search(self):
+        student = make_student()
+        self.client.force_login(student.user)
+        response = self.client.get(reverse('proposed_projects'), {'q': 'compil'})
+        self.assertEqual([entry['project'].id for entry in response.context['projects_with_topics']],
+                         [self.compilers.id])
+
+        response = self.client.get(reverse('project-search'), {'q': 'robot', 'limit': 1})
+        self.assertEqual([project['id'] for project in response.json()['results']], [self.robots.id])
+
+        # Out of range limits are clamped rather than meaning "everything"
+        for limit in (0, -1):
+            response = self.client.get(reverse('project-search'), {'q': 'robot', 'limit': limit})
+            self.assertEqual([project['id'] for project in response.json()['results']], [self.robots.id])
+        with mock.patch('register.views.ProjectSearchView.max_results', 1):
+            response = self.client.get(reverse('project-search'), {'q': 'robot', 'limit': 50})
+            self.assertEqual(len(response.json()['results']), 1)
+
+    def test_rebuild(self):
+        from django.core.management import call_command
+        get_search_backend().remove([self.robots.id, self.compilers.id, self.robots_skills.id])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(get_search_backend().search('allocation'), [self.compilers.id])
+
+
+class CustomReportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@sussex.ac.uk')
+        self.client.force_login(self.admin)
+        # warm the role cache so the measured requests only pay for the report
+        self.client.get(reverse('admin:index'))
+
+    def seed(self, supervisors, students):
+        Supervisor.objects.bulk_create(
+            Supervisor(name='Sup', surname=str(i), email=f'sup{i}@sussex.ac.uk', sussex_id=f'SUP{i}',
+                       department='Informatics', telephone_number='0')
+            for i in range(supervisors)
+        )
+        Student.objects.bulk_create(
+            Student(name='Stu', surname=str(i), email=f'stu{i}@sussex.ac.uk', sussex_id=f'STU{i}', course='CS')
+            for i in range(students)
+        )
+        supervisor_ids = list(Supervisor.objects.values_list('id', flat=True))
+        student_ids = list(Student.objects.values_list('id', flat=True))
+        statuses = [status for status, _ in Project.STATUS_CHOICES]
+        Project.objects.bulk_create(
+            Project(title=f'Project {i}', description='', required_skills='', status=statuses[i % len(statuses)],
+                    supervisor_id=supervisor_ids[i % len(supervisor_ids)],
+                    proposed_by_id=student_ids[i % len(student_ids)] if i % 2 else None)
+            for i in range(supervisors * 2)
+        )
+
+    def test_report_lists_projects_with_status_counts(self):
+        self.seed(2, 3)
+        # session, user, supervisors with counts, students, projects
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('custom_report'))
+        supervisor = response.context['report']['supervisors'][0]
+        self.assertEqual(supervisor.project_count, 2)
+        self.assertEqual(sum(count for _, count in supervisor.status_counts), 2)
+        self.assertContains(response, 'Project 3')
+
+        # The rendered report is cached until a project, supervisor or student changes
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(reverse('custom_report')), 'Project 3')
+        Project.objects.filter(title='Project 3').get().delete()
+        self.assertNotContains(self.client.get(reverse('custom_report')), 'Project 3')
+
+    def test_query_count_at_scale(self):
+        self.seed(5000, 50000)
+        with self.assertNumQueries(3):
+            report = build_report()
+        self.assertEqual(len(report['supervisors']), 5000)
+        self.assertEqual(len(report['students']), 50000)
+        self.assertEqual(sum(len(student.report_projects) for student in report['students']), 5000)
+
+    def test_csv_export_streams(self):
+        self.seed(2, 3)
+        response = self.client.get(reverse('custom_report'), {'export': 'csv', 'table': 'projects'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Title,Status,Supervisor Name,Supervisor Surname,Student Name,Student Surname')
+        self.assertEqual(len(lines), 5)
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_xlsx_export(self):
+        self.seed(2, 3)
+        response = self.client.get(reverse('custom_report'), {'export': 'xlsx', 'table': 'supervisors'})
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.active.max_row, 3)
+
+    def test_requires_staff(self):
+        self.client.force_login(make_student().user)
+        self.assertEqual(self.client.get(reverse('custom_report')).status_code, 302)
+
+
+class AllocationStatisticsTests(TransactionTestCase):
+    # The counters are written once the changes behind them commit
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor(department='Informatics')
+        self.other = make_supervisor(username='other', department='Engineering')
+        self.project = make_project(self.supervisor)
+        make_project(self.other, status='Available')
+
+    def test_counters_follow_saves_transitions_and_deletes(self):
+        self.assertEqual(stats.counts_by('status'), {'': {'Proposed': 1, 'Available': 1}})
+        transition(self.project.id, 'Proposed', 'Requested', proposed_by=make_student())
+        self.project.refresh_from_db()
+        self.project.supervisor = self.other
+        self.project.save()
+        self.assertEqual(stats.counts_by('department')['Engineering'], {'Available': 1, 'Requested': 1})
+        self.assertEqual(stats.counts_by('department')['Informatics'], {'Proposed': 0, 'Requested': 0})
+
+        self.other.department = 'Physics'
+        self.other.save()
+        self.assertEqual(stats.counts_by('department')['Physics'], {'Available': 1, 'Requested': 1})
+
+        self.project.delete()
+        self.assertEqual(stats.check(), {})
+
+    def test_supervisor_delete_and_allocation_stay_consistent(self):
+        ProjectPreference.objects.create(student=make_student(), project=self.project, rank=1)
+        run_allocation(seed=1)
+        self.assertEqual(stats.counts_by('supervisor')[str(self.supervisor.id)], {'Proposed': 0, 'Accepted': 1})
+        self.other.delete()
+        self.assertEqual(stats.check(), {})
+
+    def test_allocated_batch_moves_counters_together(self):
+        make_project(self.supervisor, title='Allocated', status='Accepted')
+        projects = [self.project] + [make_project(self.supervisor, title=f'Extra {n}') for n in range(5)]
+        # One GROUP BY, then one INSERT and one UPDATE for every counter in their own transaction
+        with self.assertNumQueries(5):
+            stats.projects_transitioned(Project, project_ids=[project.id for project in projects],
+                                        from_status='Proposed', to_status='Accepted')
+        Project.objects.filter(id__in=[project.id for project in projects]).update(status='Accepted')
+        self.assertEqual(stats.check(), {})
+
+    def test_counters_are_written_after_the_caller_commits(self):
+        from django.db import transaction
+        with transaction.atomic():
+            transition(self.project.id, 'Proposed', 'Requested', proposed_by=make_student())
+            self.assertEqual(stats.counts_by('status')['']['Proposed'], 1)
+        self.assertEqual(stats.counts_by('status')[''], {'Proposed': 0, 'Available': 1, 'Requested': 1})
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            transition(self.project.id, 'Requested', 'Accepted')
+            raise RuntimeError
+        self.assertEqual(stats.check(), {})
+
+    def test_check_and_rebuild_command(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        Project.objects.filter(id=self.project.id).update(status='Confirmed')
+        with self.assertRaises(CommandError):
+            call_command('allocation_stats', '--check', stdout=io.StringIO())
+        call_command('allocation_stats', '--rebuild', stdout=io.StringIO())
+        self.assertEqual(stats.check(), {})
+        self.assertEqual(stats.counts_by('status')['']['Confirmed'], 1)
+
+    def test_dashboard(self):
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@sussex.ac.uk'))
+        response = self.client.get(reverse('allocation_statistics'))
+        self.assertEqual(response.context['totals'], [0, 1, 1, 0, 0])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@sussex.ac.uk'))
+        # resolve the admin's roles up front so every measured request hits the role cache
+        self.client.get(reverse('admin:index'))
+
+    def seed(self, count):
+        offset = Supervisor.objects.count()
+        for i in range(offset, offset + count):
+            supervisor = make_supervisor(username=f'supervisor{i}')
+            student = make_student(username=f'student{i}')
+            project = make_project(supervisor, title=f'Project {i}', proposed_by=student)
+            make_project(supervisor, title=f'Spare {i}')
+            ProjectTopic.objects.create(title=f'Topic {i}', description='').projects.add(project)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:register_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_changelists_use_constant_queries(self):
+        self.seed(3)
+        small = {model: self.changelist_queries(model)[0] for model in ('supervisor', 'student', 'project', 'projecttopic')}
+        self.seed(30)
+        for model, count in small.items():
+            self.assertEqual(self.changelist_queries(model)[0], count, model)
+
+    def test_columns_come_from_annotations(self):
+        self.seed(1)
+        _, response = self.changelist_queries('supervisor')
+        self.assertContains(response, 'Project 0, Spare 0')
+        _, response = self.changelist_queries('student')
+        self.assertContains(response, 'Project 0')
+
+    def test_project_filters_do_not_list_every_student(self):
+        self.seed(5)
+        student = Student.objects.first()
+        _, response = self.changelist_queries('project')
+        self.assertNotContains(response, 'student4</a>')
+        response = self.client.get(reverse('admin:register_project_changelist'), {'proposed_by__id__exact': student.id})
+        self.assertEqual(list(response.context['cl'].result_list), list(Project.objects.filter(proposed_by=student)))
+
+
+class ProposalFormChoicesTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+
+    def add_topics(self, count):
+        offset = ProjectTopic.objects.count()
+        ProjectTopic.objects.bulk_create(
+            ProjectTopic(title=f'Topic {i}', description='') for i in range(offset, offset + count)
+        )
+        # bulk_create skips signals, invalidate the way a save would
+        ProjectTopic.objects.first().save()
+
+    def test_render_queries_do_not_grow_with_topics(self):
+        self.add_topics(5)
+        self.client.get(reverse('propose_project'))
+        # session and user, the existing project comes from the student dashboard
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('propose_project'))
+        self.assertContains(response, 'Topic 4')
+
+        self.add_topics(500)
+        self.client.get(reverse('propose_project'))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('propose_project'))
+        self.assertContains(response, 'Topic 504')
+
+    def test_choices_follow_changes(self):
+        self.add_topics(1)
+        self.client.get(reverse('propose_project'))
+        ProjectTopic.objects.create(title='Quantum computing', description='')
+        self.assertContains(self.client.get(reverse('propose_project')), 'Quantum computing')
+        make_supervisor(username='newsupervisor')
+        self.assertContains(self.client.get(reverse('propose_project')), 'newsupervisor')
+
+    def test_validation_uses_single_in_lookup(self):
+        self.add_topics(50)
+        topic_ids = list(ProjectTopic.objects.values_list('id', flat=True)[:10])
+        form = ProjectProposalForm({
+            'title': 'A project', 'description': 'Description', 'required_skills': 'Python',
+            'supervisor': self.supervisor.id, 'project_topics': topic_ids,
+        })
+        # one IN lookup for the topics, the supervisor get and the model's foreign key check
+        with self.assertNumQueries(3):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(sorted(topic.id for topic in form.cleaned_data['project_topics']), sorted(topic_ids))
+
+        form = ProjectProposalForm({
+            'title': 'A project', 'description': 'Description', 'required_skills': 'Python',
+            'project_topics': [topic_ids[0], 999999],
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('project_topics', form.errors)
+
+
+class RoleMiddlewareTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+
+    def test_roles_are_resolved_once(self):
+        self.client.force_login(self.supervisor.user)
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertRedirects(self.client.get(reverse('home')), reverse('supervisor_home'),
+                                 fetch_redirect_response=False)
+        # session and user only
+        self.assertEqual(len(queries), 2)
+
+    def test_views_require_the_matching_role(self):
+        self.client.force_login(self.supervisor.user)
+        self.assertRedirects(self.client.get(reverse('student_home')), reverse('unauthorised'),
+                             fetch_redirect_response=False)
+        self.client.force_login(self.student.user)
+        self.assertRedirects(self.client.get(reverse('supervisor_home')), reverse('unauthorised'),
+                             fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('student_home')).status_code, 200)
+
+    def test_profile_changes_invalidate_roles(self):
+        user = User.objects.create_user(username='newcomer')
+        self.client.force_login(user)
+        self.assertRedirects(self.client.get(reverse('student_home')), reverse('unauthorised'),
+                             fetch_redirect_response=False)
+        Student.objects.create(user=user, name='New', surname='Comer', email='new@sussex.ac.uk',
+                               sussex_id='STU-new', course='Computer Science')
+        self.assertEqual(self.client.get(reverse('student_home')).status_code, 200)
+
+
+class DatabaseRoutingTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        make_project(self.supervisor)
+
+    def test_reads_use_replica_only_when_asked(self):
+        router = ReplicaRouter()
+        with mock.patch('register.routers.has_replica', return_value=True):
+            self.assertIsNone(router.db_for_read(Project))
+            with use_replica():
+                self.assertEqual(router.db_for_read(Project), 'replica')
+                self.assertEqual(router.db_for_write(Project), 'default')
+            self.assertIsNone(router.db_for_read(Project))
+        with use_replica():
+            # Without a replica configured everything stays on the primary
+            self.assertIsNone(router.db_for_read(Project))
+        self.assertFalse(router.allow_migrate('replica', 'register'))
+
+    def test_streamed_exports_read_from_replica(self):
+        seen = []
+
+        def db_for_read(router, model, **hints):
+            seen.append((model, _use_replica.get()))
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get(reverse('project-list', args=['all']), {'format': 'ndjson'})
+            b''.join(response.streaming_content)
+        self.assertIn((Project, True), seen)
+        self.assertNotIn((Project, False), seen)
+
+    @skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_WAL, 'SQLite in WAL mode only')
+    def test_sqlite_runs_in_wal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+class SeedLoadTestTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_seeds_a_consistent_cohort(self):
+        from django.core.management import call_command, CommandError
+
+        out = io.StringIO()
+        call_command('seed_load_test', supervisors=3, students=10, topics=4, projects=20, requested=0.25, stdout=out)
+        self.assertEqual(Supervisor.objects.count(), 3)
+        self.assertEqual(Student.objects.count(), 10)
+        self.assertEqual(Project.objects.filter(status='Requested').count(), 5)
+        # Requests belong to the last students, the first ones are free to request
+        self.assertFalse(Project.objects.filter(proposed_by__user__username='loadstudent0').exists())
+        self.assertEqual(stats.check(), {})
+        self.assertTrue(self.client.login(username='loadsupervisor0', password='password'))
+
+        with self.assertRaises(CommandError):
+            call_command('seed_load_test', supervisors=1, students=1, stdout=out)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        view_stats.reset()
+        reset_cache_stats()
+        self.supervisor = make_supervisor()
+        self.client.force_login(self.supervisor.user)
+
+    def test_records_queries_and_timings_per_view(self):
+        with self.assertLogs('register.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('supervisor_home'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'supervisor_home')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertEqual(record['response_bytes'], len(response.content))
+        self.assertEqual([row['view'] for row in view_stats.summary()], ['supervisor_home'])
+
+    def test_unresolved_paths_share_one_entry(self):
+        for i in range(5):
+            self.assertEqual(self.client.get(f'/no-such-page-{i}/').status_code, 404)
+        self.assertEqual([(row['view'], row['requests']) for row in view_stats.summary()], [('<unresolved>', 5)])
+
+    def test_repeated_queries_are_reported(self):
+        metrics = RequestMetrics()
+        for project_id in (1, 2, 3):
+            metrics.signatures[query_signature(f'SELECT * FROM register_project WHERE id = {project_id}')] += 1
+        metrics.signatures[query_signature('SELECT * FROM register_project WHERE id IN (%s, %s)')] += 1
+        self.assertEqual(metrics.duplicates(3), {'SELECT * FROM register_project WHERE id = ?': 3})
+
+    def test_sampling_and_admin_page(self):
+        with self.settings(INSTRUMENTATION_SAMPLE_RATE=0):
+            self.client.get(reverse('supervisor_home'))
+        self.assertEqual(view_stats.summary(), [])
+
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@sussex.ac.uk'))
+        self.client.get(reverse('custom_report'))
+        response = self.client.get(reverse('instrumentation'))
+        self.assertContains(response, 'custom_report')
+        # the report fragment shows up in the cache table
+        self.assertEqual([row['name'] for row in response.context['caches']], ['custom_report'])
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        reset_cache_stats()
+        self.supervisor = make_supervisor()
+
+    def test_api_pages_are_cached_until_a_write(self):
+        make_project(self.supervisor, title='First')
+        url = reverse('project-list', args=['all'])
+        self.client.get(url)
+        # only the conditional GET validator
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual([row['title'] for row in response.json()['results']], ['First'])
+
+        make_project(self.supervisor, title='Second')
+        response = self.client.get(url)
+        self.assertEqual([row['title'] for row in response.json()['results']], ['First', 'Second'])
+        self.assertEqual(cache_stats(), [{'name': 'api:ProjectListView', 'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}])
+
+    def test_accepted_projects_fragment_follows_related_models(self):
+        student = make_student()
+        make_project(self.supervisor, title='Accepted', status='Accepted', proposed_by=student)
+        self.client.force_login(self.supervisor.user)
+        self.assertContains(self.client.get(reverse('accepted_projects')), 'Stu Dent')
+        with self.assertNumQueries(2):
+            self.client.get(reverse('accepted_projects'))
+
+        student.name = 'Renamed'
+        student.save()
+        self.assertContains(self.client.get(reverse('accepted_projects')), 'Renamed Dent')
+
+    def test_proposed_projects_list_keeps_csrf_out_of_the_cache(self):
+        make_project(self.supervisor, title='Open')
+        for username in ('first', 'second'):
+            self.client.force_login(make_student(username).user)
+            response = self.client.get(reverse('proposed_projects'))
+            self.assertContains(response, 'formaction="%s"' % reverse('request_project', args=[Project.objects.get().id]))
+            self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+        self.assertEqual(cache_stats()[0]['hits'], 1)
+
+
+class ConditionalListTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.project = make_project(self.supervisor, title='First')
+        self.url = reverse('project-list', args=['all'])
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Another page or format of the same rows is a different representation
+        self.assertEqual(self.client.get(self.url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_changes_invalidate_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        transition(self.project.id, 'Proposed', 'Requested')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        make_project(self.supervisor, title='Second').delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.project.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_filtered_lists_have_their_own_validator(self):
+        other = make_supervisor('other')
+        url = reverse('project-list', args=[other.id])
+        etag = self.client.get(url)['ETag']
+        make_project(self.supervisor, title='Elsewhere')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        make_project(other, title='Mine')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deletes_move_last_modified(self):
+        second = make_project(self.supervisor, title='Second')
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with mock.patch('register.conditional.time.time', return_value=time.time() + 60):
+            second.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_filtered_lists_follow_the_projects_linking_them(self):
+        student, other = make_student(), make_supervisor('other')
+        transition(self.project.id, 'Proposed', 'Requested', proposed_by=student)
+        for url in (reverse('supervisor-list', args=[student.id]), reverse('async-supervisor-list', args=[student.id])):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Neither supervisor row changes, nor how many the student has
+            self.project.refresh_from_db()
+            self.project.supervisor = other if self.project.supervisor == self.supervisor else self.supervisor
+            self.project.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_imports_accounts_and_reports_bad_rows(self):
+        from .importing import import_file
+
+        rows = io.StringIO(
+            'username,password,name,surname,email,sussex_id,course\n'
+            'alice,correct-horse,Alice,Smith,alice@sussex.ac.uk,STU1,CS\n'
+            'bob,,Bob,Jones,bob@sussex.ac.uk,STU2,CS\n'
+            'alice,x,Alice,Again,alice2@sussex.ac.uk,STU3,CS\n'
+            'carol,x,Carol,King,not-an-email,STU4,CS\n'
+            ',x,No,Name,none@sussex.ac.uk,STU5,CS\n'
+        )
+        # Two rows per batch, so a duplicate in a later batch is still caught
+        result = import_file('students', rows, 'csv', batch_size=2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in sorted(result.errors)], [4, 5, 6])
+        self.assertTrue(User.objects.get(username='alice').check_password('correct-horse'))
+        self.assertFalse(User.objects.get(username='bob').has_usable_password())
+        self.assertEqual(Student.objects.get(sussex_id='STU1').user.username, 'alice')
+
+    def test_rejected_rows_do_not_claim_their_values(self):
+        from django.db import DatabaseError
+        from .importing import import_file
+
+        make_student('taken', email='taken@sussex.ac.uk')
+        rows = io.StringIO(
+            'username,name,surname,email,sussex_id,course\n'
+            'dave,Dave,One,taken@sussex.ac.uk,STU1,CS\n'
+            'dave,Dave,Two,dave@sussex.ac.uk,STU2,CS\n'
+        )
+        result = import_file('students', rows, 'csv')
+        self.assertEqual((result.created, [line for line, _ in result.errors]), (1, [2]))
+        self.assertEqual(Student.objects.get(user__username='dave').sussex_id, 'STU2')
+
+        # A batch the database rejects frees its values for a retry later in the file
+        from .importing import StudentImporter
+        save = StudentImporter.save
+        failures = [DatabaseError('locked')]
+
+        def flaky_save(importer, valid):
+            if failures:
+                raise failures.pop()
+            return save(importer, valid)
+
+        rows = io.StringIO(
+            'username,name,surname,email,sussex_id,course\n'
+            'erin,Erin,E,erin@sussex.ac.uk,STU3,CS\n'
+            'erin,Erin,E,erin@sussex.ac.uk,STU3,CS\n'
+        )
+        with mock.patch.object(StudentImporter, 'save', flaky_save):
+            result = import_file('students', rows, 'csv', batch_size=1)
+        self.assertEqual((result.created, [line for line, _ in result.errors]), (1, [2]))
+
+    def test_imports_projects_with_topics_from_jsonl(self):
+        from .importing import import_file
+
+        supervisor = make_supervisor(sussex_id='SUP1')
+        ProjectTopic.objects.create(title='Robotics', description='')
+        rows = io.StringIO('\n'.join(json.dumps(row) for row in [
+            {'title': 'Robot arm', 'description': 'Arm', 'required_skills': 'C', 'supervisor': 'SUP1', 'topics': 'Robotics'},
+            {'title': 'Lost', 'supervisor': 'NOBODY'},
+            {'title': 'Odd status', 'supervisor': 'SUP1', 'status': 'Finished'},
+        ]) + '\nnot json\n')
+        result = import_file('projects', rows, 'jsonl')
+        self.assertEqual(result.created, 1)
+        self.assertEqual(len(result.errors), 3)
+        project = Project.objects.get(title='Robot arm')
+        self.assertEqual(project.supervisor, supervisor)
+        self.assertEqual([topic.title for topic in project.projecttopic_set.all()], ['Robotics'])
+        # bulk_create bypasses the signals, the derived data is refreshed afterwards
+        self.assertEqual(stats.check(), {})
+        self.assertEqual(get_search_backend().search('robot'), [project.id])
+
+    def test_admin_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@sussex.ac.uk'))
+        self.assertContains(self.client.get(reverse('admin:register_projecttopic_changelist')), 'Import')
+        upload = SimpleUploadedFile('topics.csv', b'title,description\nVision,Images\n,Missing title\n')
+        response = self.client.post(reverse('admin:register_projecttopic_import'), {'file': upload}, follow=True)
+        self.assertContains(response, 'Missing title')
+        self.assertTrue(ProjectTopic.objects.filter(title='Vision').exists())
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='student', password='correct-horse')
+        Student.objects.create(user=self.user, name='Stu', surname='Dent', email='student@sussex.ac.uk',
+                               sussex_id='STU-student', course='Computer Science')
+
+    def login(self):
+        return self.client.post(reverse('login'), {'username': 'student', 'password': 'correct-horse'})
+
+    def test_password_is_checked_once(self):
+        with mock.patch.object(TunablePBKDF2PasswordHasher, 'verify', autospec=True,
+                               side_effect=TunablePBKDF2PasswordHasher.verify) as verify:
+            self.assertRedirects(self.login(), reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(verify.call_count, 1)
+
+        response = self.client.post(reverse('login'), {'username': 'student', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['form'].is_valid())
+
+    def test_changed_work_factor_rehashes_on_login(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.login()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('correct-horse'))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_cache_sessions_survive_the_disposable_cache(self):
+        self.login()
+        # Fragments, dashboards and roles may all be dropped, sessions live in the state cache
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('student_home')).status_code, 200)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_write_no_session_rows(self):
+        from django.contrib.sessions.models import Session
+
+        self.login()
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertEqual(self.client.get(reverse('student_home')).status_code, 200)
+
+
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+        self.client.force_login(self.student.user)
+        self.project = make_project(self.supervisor)
+        self.url = reverse('request_project', args=[self.project.id])
+
+    @override_settings(ADMISSION_CONTROL={'request_project': {'user_rate': 0.01, 'user_burst': 2}})
+    def test_burst_beyond_the_user_bucket_is_rejected(self):
+        self.client.post(self.url)
+        self.client.post(self.url)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+        # The bucket is kept however much the disposable cache churns
+        cache.clear()
+        self.assertEqual(self.client.post(self.url).status_code, 429)
+
+        # Other students draw on their own bucket
+        other = make_student('other')
+        self.client.force_login(other.user)
+        self.assertEqual(self.client.post(self.url).status_code, 302)
+
+    @override_settings(ADMISSION_CONTROL={'request_project': {'global_rate': 0.01, 'global_burst': 1}})
+    def test_global_bucket_is_shared_by_everyone(self):
+        self.client.post(self.url)
+        self.client.force_login(make_student('other').user)
+        self.assertEqual(self.client.post(self.url).status_code, 429)
+
+    def test_duplicate_submissions_write_once(self):
+        for _ in range(3):
+            response = self.client.post(self.url, {'idempotency_key': 'abc'})
+            self.assertRedirects(response, reverse('proposed_projects'), fetch_redirect_response=False)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.proposed_by, self.student)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_key_still_running_is_rejected(self):
+        from .admission import idempotency_key
+
+        request = mock.Mock(path=self.url, user=self.student.user, headers={'Idempotency-Key': 'abc'})
+        caches['state'].set(idempotency_key(request, 'request_project'), 'pending')
+        response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Project.objects.get().status, 'Proposed')
+
+    def test_saturated_gate_is_rejected(self):
+        from .admission import get_gate
+
+        policy = {'max_in_flight': 1, 'max_queue': 0, 'queue_timeout': 0.01}
+        gate = get_gate('request_project', policy)
+        self.assertTrue(gate.enter(0))
+        try:
+            with self.settings(ADMISSION_CONTROL={'request_project': policy}):
+                response = self.client.post(self.url)
+        finally:
+            gate.leave()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Project.objects.get().status, 'Proposed')
+
+    def test_forms_carry_an_idempotency_key(self):
+        self.assertContains(self.client.get(reverse('proposed_projects')), 'name="idempotency_key"')
+
+
+class StudentDashboardTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+        self.project = make_project(self.supervisor)
+        self.client.force_login(self.student.user)
+
+    def test_dashboard_is_served_from_one_record(self):
+        self.client.get(reverse('student_home'))
+        # session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('student_home'))
+        self.assertIsNone(response.context['dashboard']['project'])
+        self.assertContains(response, 'You have not requested or proposed a project yet.')
+
+    def test_requesting_a_project_refreshes_the_record(self):
+        self.client.get(reverse('student_home'))
+        self.client.post(reverse('request_project', args=[self.project.id]))
+        OutboxWorker().drain()
+
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.data['project']['status'], 'Requested')
+        self.assertEqual(response.data['project']['supervisor']['email'], 'supervisor@sussex.ac.uk')
+
+        self.client.force_login(self.supervisor.user)
+        self.client.post(reverse('manage_proposals'), {'project_id': self.project.id, 'accept_project': ''})
+        self.client.force_login(self.student.user)
+        self.assertContains(self.client.get(reverse('student_home')), 'Accepted')
+
+    def test_notifications_and_supervisor_changes_refresh_the_record(self):
+        self.project.proposed_by = self.student
+        self.project.save()
+        self.client.get(reverse('student_home'))
+
+        Notification.objects.create(user=self.student.user, message='Your project was accepted')
+        self.supervisor.surname = 'Renamed'
+        self.supervisor.save()
+        response = self.client.get(reverse('student_home'))
+        self.assertContains(response, 'Your project was accepted')
+        self.assertContains(response, 'Super Renamed')
+
+        self.project.proposed_by = None
+        self.project.save()
+        self.assertIsNone(self.client.get(reverse('student_dashboard')).data['project'])
+
+    def test_record_cached_before_commit_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.proposed_by = self.student
+            with CaptureQueriesContext(connection) as queries:
+                self.project.save()
+            # Stats and the dashboards share one read of the stored row
+            reads = [query for query in queries
+                     if query['sql'].startswith('SELECT') and 'FROM "register_project" ' in query['sql']]
+            self.assertEqual(len(reads), 1)
+            # A reader still seeing the old rows caches them mid-transaction
+            stale = {'project': None, 'notifications': []}
+            cache.set(dashboard_key(self.student.user_id, get_version(DASHBOARDS)), stale)
+        self.assertEqual(get_student_dashboard(self.student.user)['project']['id'], self.project.id)
+
+    def test_dashboard_endpoint_is_for_students(self):
+        self.client.force_login(self.supervisor.user)
+        self.assertEqual(self.client.get(reverse('student_dashboard')).status_code, 403)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.supervisor = make_supervisor()
+        self.student = make_student()
+        for i in range(25):
+            make_project(self.supervisor, title=f'Project {i}')
+
+    async def test_async_list_pages_match_the_api(self):
+        url = reverse('async-project-list', args=['all']) + '?page_size=10'
+        seen = []
+        while url:
+            response = await self.async_client.get(url)
+            data = response.json()
+            seen.extend(project['id'] for project in data['results'])
+            url = data['next']
+        ids = [project_id async for project_id in Project.objects.order_by('id').values_list('id', flat=True)]
+        self.assertEqual(seen, ids)
+
+        # Walking back from the last page with the previous links
+        previous = data['previous']
+        response = await self.async_client.get(previous)
+        self.assertEqual([project['id'] for project in response.json()['results']], ids[10:20])
+
+        api = await sync_to_async(self.client.get)(reverse('project-list', args=['all']), {'page_size': 10})
+        response = await self.async_client.get(reverse('async-project-list', args=['all']), {'page_size': 10})
+        self.assertEqual(response.json()['results'], api.json()['results'])
+
+    async def test_async_list_answers_conditional_requests(self):
+        url = reverse('async-supervisor-list', args=['all'])
+        response = await self.async_client.get(url)
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.supervisor.id])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_list_streams_ndjson(self):
+        response = await self.async_client.get(reverse('async-project-list', args=[self.supervisor.id]),
+                                               {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual([json.loads(line)['title'] for line in lines], [f'Project {i}' for i in range(25)])
+
+    async def test_async_ndjson_answers_conditional_requests(self):
+        url = reverse('async-project-list', args=['all'])
+        response = await self.async_client.get(url, {'format': 'ndjson'})
+        etag = response['ETag']
+        self.assertTrue(response['Last-Modified'])
+        self.assertNotEqual(etag, (await self.async_client.get(url))['ETag'])
+        response = await self.async_client.get(url, {'format': 'ndjson'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_pages_render_under_asgi(self):
+        await self.async_client.aforce_login(self.student.user)
+        response = await self.async_client.get(reverse('proposed_projects'))
+        self.assertContains(response, 'Project 24')
+        self.assertEqual(response.context['existing_project'], None)
+
+        await self.async_client.aforce_login(self.supervisor.user)
+        await Notification.objects.acreate(user=self.supervisor.user, message='Project requested')
+        response = await self.async_client.get(reverse('supervisor_home'))
+        self.assertContains(response, 'Project requested')
+        self.assertEqual(response.context['unread_count'], 1)
+
+        response = await self.async_client.get(reverse('proposed_projects'))
+        self.assertRedirects(response, reverse('unauthorised'), fetch_redirect_response=False)
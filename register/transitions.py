@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Project
+
+# Legal moves between Project.STATUS_CHOICES. Student proposals are created
+# directly as 'Requested', everything else has to go through transition().
+TRANSITIONS = {
+    # Batch allocation accepts straight from the catalogue
+    'Proposed': {'Requested', 'Accepted'},
+    'Available': {'Requested'},
+    'Requested': {'Accepted', 'Proposed'},
+    'Accepted': {'Confirmed'},
+    'Confirmed': set(),
+}
+
+# Sent after a transition commits, queryset updates do not send post_save
+project_transitioned = Signal()
+# The same for many projects moved together by a bulk update
+projects_transitioned = Signal()
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def transition(project_id, from_status, to_status, **changes):
+    """
+    Move a project from one status to another with a single conditional UPDATE.
+
+    Returns False when the project is no longer in ``from_status``, so of two
+    concurrent callers exactly one wins.
+    """
+    if not can_transition(from_status, to_status):
+        raise InvalidTransition(f'{from_status} -> {to_status} is not allowed')
+
+    previous_proposed_by = None
+    with transaction.atomic():
+        if 'proposed_by' in changes or 'proposed_by_id' in changes:
+            # Receivers need to know which student the project is leaving
+            previous_proposed_by = Project.objects.filter(id=project_id, status=from_status) \
+                .values_list('proposed_by_id', flat=True).first()
+        updated = Project.objects.filter(id=project_id, status=from_status).update(
+            status=to_status, updated_at=timezone.now(), **changes
+        )
+    if updated:
+        project_transitioned.send(sender=Project, project_id=project_id, from_status=from_status, to_status=to_status,
+                                  previous_proposed_by=previous_proposed_by)
+    return bool(updated)
@@ -1,24 +1,36 @@
 from django.urls import path
 from . import views
 from .views import register_topic, register_proposal, manage_proposals, accepted_projects, custom_report_view, \
-    ProjectListView, SupervisorListView, StudentListView, unauthorised
+    ProjectListView, ProjectSearchView, SupervisorListView, StudentListView, unauthorised
 
 urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('', views.home, name='home'),
     path('student_home/', views.student_home, name='student_home'),
+    path('student_home/dashboard/', views.StudentDashboardView.as_view(), name='student_dashboard'),
     path('supervisor_home/', views.supervisor_home, name='supervisor_home'),
+    path('notifications/', views.notification_history, name='notification_history'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('register-topic/', register_topic, name='register_topic'),
     path('register-proposal/', register_proposal, name='register_proposal'),
     path('manage-proposals/', manage_proposals, name='manage_proposals'),
     path('accepted-projects/', accepted_projects, name='accepted_projects'),
     path('proposed-projects/', views.proposed_projects, name='proposed_projects'),
     path('propose-project/', views.propose_project, name='propose_project'),
+    path('project-preferences/', views.project_preferences, name='project_preferences'),
     path('request-project/<int:project_id>/', views.request_project, name='request_project'),
     path('custom-report/', custom_report_view, name='custom_report'),
+    path('allocation-statistics/', views.allocation_statistics, name='allocation_statistics'),
+    path('instrumentation/', views.instrumentation, name='instrumentation'),
+    path('project/search/', ProjectSearchView.as_view(), name='project-search'),
     path('project/<str:supervisorid>/', ProjectListView.as_view(), name='project-list'),
     path('supervisor/<str:studentid>/', SupervisorListView.as_view(), name='supervisor-list'),
     path('student/<str:supervisorid>/', StudentListView.as_view(), name='student-list'),
+    # The same lists as async views, for serving through asgi.py
+    path('async/project/<str:key>/', views.AsyncProjectListView.as_view(), name='async-project-list'),
+    path('async/supervisor/<str:key>/', views.AsyncSupervisorListView.as_view(), name='async-supervisor-list'),
+    path('async/student/<str:key>/', views.AsyncStudentListView.as_view(), name='async-student-list'),
     path('unauthorised/', unauthorised, name='unauthorised'),
 ]
\ No newline at end of file
@@ -1,61 +1,193 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .forms import LoginForm, ProjectProposalForm, ProjectRequestForm, ProjectTopicForm
-from .models import Supervisor, Student, Project, Notification
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+from django.utils.cache import get_conditional_response
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views import View
+from django.views.decorators.http import require_POST
+from .admission import admission_control
+from .decorators import student_required, supervisor_required
+from .forms import LoginForm, ProjectProposalForm, ProjectRequestForm, ProjectTopicForm, ProjectPreferenceForm
+from .models import Supervisor, Student, Project, Notification, ProjectPreference
+from . import reports, stats
+from .choices import choices_version, TOPIC_CHOICES, SUPERVISOR_CHOICES
+from .caching import acached, cache_stats, reset_cache_stats
+from .conditional import ConditionalListMixin, alist_validator, list_validators, set_validators
+from .dashboard import aget_student_dashboard, get_student_dashboard
+from .catalogue import get_proposed_catalogue, search_catalogue
+from .notifications import alatest_notifications, aunread_count, mark_read, unread_count
+from .outbox import enqueue_notification
+from .transitions import can_transition, transition
+from .pubsub import get_broker, notification_channel
 
 from rest_framework import generics
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
+from .instrumentation import view_stats
+from .pagination import CursorPaginatedMixin, apaginate
+from .routers import replica_view
+from .streaming import NDJSONExportMixin, NDJSONRenderer, astream_ndjson, wants_ndjson
+from .search import search_projects
 from .serializers import SupervisorSerializer, StudentSerializer, ProjectSerializer
 
 
 
-class ProjectListView(APIView):
+def projects_for(supervisorid):
+    if supervisorid == 'all':
+        return Project.objects.all()
+    return Project.objects.filter(supervisor__id=supervisorid)
+
+
+def supervisors_for(studentid):
+    if studentid == 'all':
+        return Supervisor.objects.all()
+    return Supervisor.objects.filter(project__proposed_by__id=studentid).distinct()
+
+
+def students_for(supervisorid):
+    if supervisorid == 'all':
+        return Student.objects.all()
+    return Student.objects.filter(project__supervisor__id=supervisorid).distinct()
+
+
+# The Project rows that pick out a filtered supervisor or student list, which
+# change it without touching the listed rows themselves
+def supervisor_links_for(studentid):
+    if studentid == 'all':
+        return None
+    return Project.objects.filter(proposed_by__id=studentid)
+
+
+def student_links_for(supervisorid):
+    if supervisorid == 'all':
+        return None
+    return Project.objects.filter(supervisor__id=supervisorid)
+
+
+class ProjectListView(ConditionalListMixin, NDJSONExportMixin, CursorPaginatedMixin, APIView):
+    cache_models = (Project,)
+
+    @replica_view
     def get(self, request, supervisorid=None):
-        if supervisorid == 'all':
-            projects = Project.objects.all()
-        else:
-            projects = Project.objects.filter(supervisor__id=supervisorid)
+        return self.list_response(projects_for(supervisorid), ProjectSerializer)
+
 
-        serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+class ProjectSearchView(APIView):
+    max_results = 200
 
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 50
+        # 0 means no limit further down, and a negative limit slices from the end
+        limit = max(1, min(limit, self.max_results))
+        projects = Project.objects.all()
+        if 'status' in request.query_params:
+            projects = projects.filter(status=request.query_params['status'])
 
-class SupervisorListView(APIView):
+        results = search_projects(query, queryset=projects, limit=limit) if query else []
+        serializer = ProjectSerializer(results, many=True)
+        return Response({'query': query, 'results': serializer.data})
+
+
+class SupervisorListView(ConditionalListMixin, NDJSONExportMixin, CursorPaginatedMixin, APIView):
+    cache_models = (Supervisor, Project)
+
+    @replica_view
     def get(self, request, studentid=None):
-        if studentid == 'all':
-            supervisors = Supervisor.objects.all()
-        else:
-            supervisors = Supervisor.objects.filter(student__id=studentid)
+        return self.list_response(supervisors_for(studentid), SupervisorSerializer,
+                                  filtered_by=supervisor_links_for(studentid))
 
-        serializer = SupervisorSerializer(supervisors, many=True)
-        return Response(serializer.data)
 
+class StudentListView(ConditionalListMixin, NDJSONExportMixin, CursorPaginatedMixin, APIView):
+    cache_models = (Student, Project)
 
-class StudentListView(APIView):
+    @replica_view
     def get(self, request, supervisorid=None):
-        if supervisorid == 'all':
-            students = Student.objects.all()
-        else:
-            students = Student.objects.filter(project__supervisor__id=supervisorid)
-
-        serializer = StudentSerializer(students, many=True)
-        return Response(serializer.data)
+        return self.list_response(students_for(supervisorid), StudentSerializer,
+                                  filtered_by=student_links_for(supervisorid))
+
+
+class AsyncListView(View):
+    """
+    The list endpoints above as plain async views for ASGI servers, querying
+    with the async ORM on the event loop (DRF's APIView is synchronous only).
+    They return the same JSON pages, cursors, validators and NDJSON export,
+    without the browsable API.
+    """
+    serializer_class = None
+    cache_models = ()
+    export_chunk_size = 2000
+    # key -> the listed rows, and optionally the Project rows that filter them
+    queryset_for = None
+    filtered_by_for = None
+
+    @replica_view
+    async def get(self, request, key):
+        queryset = self.queryset_for(key)
+        format = NDJSONRenderer.format if wants_ndjson(request) else 'json'
+        # Validated before either format is built, as ConditionalListMixin does
+        filtered_by = self.filtered_by_for(key) if self.filtered_by_for else None
+        validator = await alist_validator(queryset, filtered_by, self.cache_models)
+        etag, timestamp = list_validators(request, format, validator)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None and format == NDJSONRenderer.format:
+            response = astream_ndjson(queryset, self.serializer_class, chunk_size=self.export_chunk_size)
+        elif response is None:
+            async def build():
+                return await apaginate(request, queryset, self.serializer_class)
+
+            data = await acached(f'api:{type(self).__name__}', self.cache_models, build,
+                                 vary_on=[request.build_absolute_uri()])
+            response = JsonResponse(data, encoder=JSONEncoder)
+        return set_validators(response, etag, timestamp)
+
+
+class AsyncProjectListView(AsyncListView):
+    serializer_class = ProjectSerializer
+    cache_models = ProjectListView.cache_models
+    queryset_for = staticmethod(projects_for)
+
+
+class AsyncSupervisorListView(AsyncListView):
+    serializer_class = SupervisorSerializer
+    cache_models = SupervisorListView.cache_models
+    queryset_for = staticmethod(supervisors_for)
+    filtered_by_for = staticmethod(supervisor_links_for)
+
+
+class AsyncStudentListView(AsyncListView):
+    serializer_class = StudentSerializer
+    cache_models = StudentListView.cache_models
+    queryset_for = staticmethod(students_for)
+    filtered_by_for = staticmethod(student_links_for)
 
 
 def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            user = authenticate(request, username=form.cleaned_data['username'], password=form.cleaned_data['password'])
-            if user is not None:
-                login(request, user)
-                return redirect('home')
-            else:
-                form.add_error(None, 'Invalid login credentials')
+            # AuthenticationForm has already checked the password, authenticating
+            # again would hash it a second time on every login
+            login(request, form.get_user())
+            return redirect('home')
     else:
         form = LoginForm()
     return render(request, 'login.html', {'form': form})
@@ -64,9 +196,9 @@ def login_view(request):
 @login_required
 def home(request):
     user = request.user
-    if Supervisor.objects.filter(user=user).exists():
+    if request.supervisor:
         return redirect('supervisor_home')
-    elif Student.objects.filter(user=user).exists():
+    elif request.student:
         return redirect('student_home')
     elif user.is_superuser:
         return redirect('admin:index')  # Redirect to the Django admin index page
@@ -78,42 +210,49 @@ def logout_view(request):
     return redirect('login')
 
 
-@login_required
+@student_required
 def student_home(request):
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
-        # Redirect to a different page if the user is not a student
-        return redirect('unauthorised')
-    return render(request, 'student_home.html')
+    return render(request, 'student_home.html', {
+        'dashboard': get_student_dashboard(request.user),
+        'unread_count': unread_count(request.user),
+    })
 
-@login_required
-def proposed_projects(request):
-    student = get_object_or_404(Student, user=request.user)
-    proposed_projects = Project.objects.filter(status='Proposed')
 
+class StudentDashboardView(APIView):
+    """The student_home record as JSON, for clients polling their status."""
+
+    def get(self, request):
+        if request.student is None:
+            return Response({'detail': 'Only students have a dashboard.'}, status=403)
+        return Response({**get_student_dashboard(request.user), 'unread_count': unread_count(request.user)})
+
+@student_required
+async def proposed_projects(request):
     # Check if the student has already proposed or requested a project
-    existing_project = Project.objects.filter(proposed_by=student).first()
-
-    projects_with_topics = []
-    for project in proposed_projects:
-        topics = project.projecttopic_set.all()  # Get the related topics
-        projects_with_topics.append({
-            'project': project,
-            'topics': topics
-        })
+    existing_project = (await aget_student_dashboard(request.user))['project']
 
-    return render(request, 'proposed_projects.html', {
-        'projects_with_topics': projects_with_topics,
+    query = request.GET.get('q', '').strip()
+
+    def catalogue():
+        # Projects, supervisors and topics come from the shared cached catalogue
+        projects_with_topics = get_proposed_catalogue()
+        return search_catalogue(projects_with_topics, query) if query else projects_with_topics
+
+    # Rendered in a thread so the catalogue is only loaded (and searched, which
+    # uses raw SQL with no async API) when the cached list fragment is stale
+    return await sync_to_async(render)(request, 'proposed_projects.html', {
+        'projects_with_topics': SimpleLazyObject(catalogue),
         'existing_project': existing_project,
+        'query': query,
     })
 
 
-@login_required
+@student_required
+@admission_control('propose_project')
 def propose_project(request):
-    student = get_object_or_404(Student, user=request.user)
+    student = request.student
 
-    existing_project = Project.objects.filter(proposed_by=student).first()
+    existing_project = get_student_dashboard(request.user)['project']
 
     if existing_project:
         return render(request, 'proposed_project_detail.html', {
@@ -125,6 +264,7 @@ def propose_project(request):
         if proposal_form.is_valid():
             new_project = proposal_form.save(commit=False)
             new_project.proposed_by = student
+            new_project.student_proposal = True
             new_project.status = 'Requested'
             new_project.save()
 
@@ -133,7 +273,7 @@ def propose_project(request):
             new_project.projecttopic_set.set(project_topics)
 
             # Send notification to supervisor
-            Notification.objects.create(
+            enqueue_notification(
                 user=new_project.supervisor.user,
                 message=f"New project proposed by {student.user.username}: {new_project.title}"
             )
@@ -144,23 +284,32 @@ def propose_project(request):
 
     return render(request, 'propose_project.html', {
         'proposal_form': proposal_form,
+        'choices_version': choices_version(TOPIC_CHOICES, SUPERVISOR_CHOICES),
     })
 
 
-@login_required
+@student_required
+@admission_control('request_project')
 def request_project(request, project_id):
-    student = get_object_or_404(Student, user=request.user)
+    student = request.student
     project = get_object_or_404(Project, id=project_id)
     if request.method == 'POST':
-        project.status = 'Requested'
-        project.proposed_by = student
-        project.save()
+        with transaction.atomic():
+            if Project.objects.filter(proposed_by=student).exists():
+                messages.error(request, 'You have already proposed/requested a project.')
+                return redirect('proposed_projects')
 
-        # Send notification to supervisor
-        Notification.objects.create(
-            user=project.supervisor.user,
-            message=f"Project requested by {request.user.username}: {project.title}"
-        )
+            # Conditional update, if another student got there first this is a no-op
+            if not can_transition(project.status, 'Requested') or \
+                    not transition(project.id, project.status, 'Requested', proposed_by=student):
+                messages.error(request, f'{project.title} has already been requested by another student.')
+                return redirect('proposed_projects')
+
+            # Send notification to supervisor
+            enqueue_notification(
+                user=project.supervisor.user,
+                message=f"Project requested by {request.user.username}: {project.title}"
+            )
 
         return redirect('proposed_projects')
 
@@ -170,27 +319,105 @@ def request_project(request, project_id):
     # })
 
 
+@student_required
+def project_preferences(request):
+    student = request.student
+    current = ProjectPreference.objects.filter(student=student).order_by('rank')
+
+    if request.method == 'POST':
+        form = ProjectPreferenceForm(request.POST)
+        if form.is_valid():
+            with transaction.atomic():
+                current.delete()
+                ProjectPreference.objects.bulk_create(
+                    ProjectPreference(student=student, project_id=project_id, rank=rank)
+                    for rank, project_id in enumerate(form.cleaned_data['ranked_projects'], start=1)
+                )
+            messages.success(request, 'Your project preferences have been saved.')
+            return redirect('student_home')
+    else:
+        form = ProjectPreferenceForm(initial={
+            f'choice_{preference.rank}': preference.project_id for preference in current
+        })
+
+    return render(request, 'project_preferences.html', {
+        'form': form,
+    })
+
+
 def unauthorised(request):
     return render(request, 'unauthorised.html')
 
-@login_required
-def supervisor_home(request):
-    try:
-        supervisor = get_object_or_404(Supervisor, user=request.user)
-    except Supervisor.DoesNotExist:
-        return redirect('unauthorised')
-    notifications = Notification.objects.filter(user=request.user, read=False)
-    print(notifications)
+@supervisor_required
+async def supervisor_home(request):
+    notifications = await alatest_notifications(request.user)
 
     return render(request, 'supervisor_home.html', {
         'notifications': notifications,
+        'unread_count': await aunread_count(request.user),
     })
 
 
 @login_required
+@require_POST
+def mark_notifications_read(request):
+    if 'all' in request.POST:
+        mark_read(request.user)
+    else:
+        ids = [i for i in request.POST.getlist('notification_ids') if i.isdigit()]
+        mark_read(request.user, ids)
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('supervisor_home')
+
+
+NOTIFICATION_STREAM_HEARTBEAT = 15
+
+
+async def notification_stream(request):
+    # Server-sent events holding one connection open per browser, this only
+    # works when served through asgi.py since WSGI would tie up a worker.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Notification streaming requires the ASGI server.', status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    subscription = get_broker().subscribe(notification_channel(user.id))
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await subscription.get(timeout=NOTIFICATION_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: notification\ndata: {json.dumps(message)}\n\n'
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def notification_history(request):
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at', '-id')
+    page = Paginator(notifications, 25).get_page(request.GET.get('page'))
+
+    return render(request, 'notification_history.html', {
+        'page': page,
+    })
+
+
+@supervisor_required
 def register_topic(request):
-    user = request.user
-    supervisor = get_object_or_404(Supervisor, user=user)
+    supervisor = request.supervisor
     if request.method == 'POST':
         topic_form = ProjectTopicForm(request.POST)
         if topic_form.is_valid():
@@ -206,10 +433,9 @@ def register_topic(request):
     })
 
 
-@login_required
+@supervisor_required
 def register_proposal(request):
-    user = request.user
-    supervisor = get_object_or_404(Supervisor, user=user)
+    supervisor = request.supervisor
 
     if request.method == 'POST':
         proposal_form = ProjectProposalForm(request.POST)
@@ -229,23 +455,31 @@ def register_proposal(request):
     proposal_form.fields.pop('supervisor')
     return render(request, 'register_proposal.html', {
         'proposal_form': proposal_form,
+        'choices_version': choices_version(TOPIC_CHOICES),
     })
 
 
-@login_required
+@supervisor_required
 def manage_proposals(request):
-    notifications = Project.objects.filter(status='Requested')
+    supervisor = request.supervisor
+    notifications = Project.objects.filter(supervisor=supervisor, status='Requested').select_related('proposed_by')
     if request.method == 'POST':
-        project_id = request.POST.get('project_id')
+        project_id = request.POST.get('project_id', '')
+        if not project_id.isdigit():
+            raise Http404('No such proposal.')
+        project = get_object_or_404(Project, id=project_id, supervisor=supervisor)
         if 'accept_project' in request.POST:
-            project = Project.objects.get(id=project_id)
-            print(project.proposed_by)
-            project.status = 'Accepted'
-            print(project.proposed_by)
-            project.save()
+            done = transition(project.id, 'Requested', 'Accepted')
         elif 'reject_project' in request.POST:
-            project = Project.objects.get(id=project_id)
-            project.delete()
+            if project.student_proposal:
+                done, _ = Project.objects.filter(id=project.id, status='Requested').delete()
+            else:
+                # A catalogue project goes back on offer to other students
+                done = transition(project.id, 'Requested', 'Proposed', proposed_by=None)
+        else:
+            done = True
+        if not done:
+            messages.error(request, 'This proposal has already been dealt with.')
         return redirect('manage_proposals')
 
     return render(request, 'manage_proposals.html', {
@@ -253,21 +487,67 @@ def manage_proposals(request):
     })
 
 
-@login_required
+@supervisor_required
 def accepted_projects(request):
-    user = request.user
-    supervisor = get_object_or_404(Supervisor, user=user)
-    accepted_projects = Project.objects.filter(supervisor=supervisor, status='Accepted')
+    supervisor = request.supervisor
+    # Only evaluated when the cached list in the template is stale
+    accepted_projects = Project.objects.filter(supervisor=supervisor, status='Accepted').select_related('proposed_by')
 
     return render(request, 'accepted_projects.html', {
         'accepted_projects': accepted_projects,
     })
 
 
-def custom_report_view(request):
-    supervisors = Supervisor.objects.prefetch_related('projects').all()
-    students = Student.objects.select_related('selected_project').all()
-    return render(request, 'admin/custom_report.html', {
-        'supervisors': supervisors,
-        'students': students
+@staff_member_required
+@replica_view
+def allocation_statistics(request):
+    statuses = reports.STATUSES
+
+    def row(counts):
+        return [counts.get(status, 0) for status in statuses]
+
+    by_supervisor = stats.counts_by('supervisor')
+    names = {
+        str(supervisor.id): f'{supervisor.name} {supervisor.surname}'
+        for supervisor in Supervisor.objects.filter(id__in=[int(key) for key in by_supervisor]).only('name', 'surname')
+    }
+    return render(request, 'admin/allocation_statistics.html', {
+        'statuses': statuses,
+        'totals': row(stats.counts_by('status').get('', {})),
+        'departments': sorted((key, row(counts)) for key, counts in stats.counts_by('department').items()),
+        'supervisors': sorted((names.get(key, key), row(counts)) for key, counts in by_supervisor.items()),
+    })
+
+
+@staff_member_required
+def instrumentation(request):
+    if request.method == 'POST':
+        view_stats.reset()
+        reset_cache_stats()
+        return redirect('instrumentation')
+    return render(request, 'admin/instrumentation.html', {
+        'views': view_stats.summary(),
+        'caches': cache_stats(),
+        'sample_rate': settings.INSTRUMENTATION_SAMPLE_RATE,
+        'slow_query_ms': settings.INSTRUMENTATION_SLOW_QUERY_MS,
     })
+
+
+@staff_member_required
+@replica_view
+def custom_report_view(request):
+    export = request.GET.get('export')
+    if export:
+        table = request.GET.get('table', 'projects')
+        if table not in reports.REPORT_TABLES:
+            raise Http404('Unknown report table')
+        if export == 'csv':
+            return reports.csv_response(table)
+        if export == 'xlsx':
+            if reports.openpyxl is None:
+                return HttpResponse('XLSX export needs openpyxl installed.', status=501)
+            return reports.xlsx_response(table)
+        raise Http404('Unknown export format')
+
+    # Built only when the cached report fragment is stale
+    return render(request, 'admin/custom_report.html', {'report': SimpleLazyObject(reports.build_report)})
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,17 +48,50 @@ INSTALLED_APPS = [
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'register.pagination.KeysetCursorPagination',
+    # Page size for the cursor paginated list endpoints, clients may override
+    # it per request with ?page_size= up to KeysetCursorPagination.max_page_size
+    'PAGE_SIZE': 100,
+}
+
+# Full-text search over projects, DatabaseSearchBackend falls back to LIKE
+# queries on databases without FTS5 (PostgreSQL, see DATABASES below)
+if os.environ.get('POSTGRES_DB'):
+    PROJECT_SEARCH_BACKEND = 'register.search.DatabaseSearchBackend'
+else:
+    PROJECT_SEARCH_BACKEND = 'register.search.SQLiteFTSBackend'
+
+# Backend used to push new notifications to connected browsers
+NOTIFICATION_BROKER = 'register.pubsub.InProcessBroker'
+
+# Notifications are queued in the outbox and delivered by a worker, either the
+# in-process background thread or `manage.py process_notifications`
+NOTIFICATION_OUTBOX_AUTODISPATCH = True
+# Extra callables run for every delivered Notification (email, webhooks, ...)
+NOTIFICATION_DELIVERY_BACKENDS = []
+
+# Per-request SQL and timing instrumentation, logged as JSON to the
+# register.instrumentation logger and summarised at /instrumentation/
+INSTRUMENTATION_SAMPLE_RATE = 1.0
+INSTRUMENTATION_SLOW_QUERY_MS = 100
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+# A query signature repeated this often in one request is reported as a likely N+1
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = 3
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
 
 MIDDLEWARE = [
+    'register.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'register.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +100,8 @@ ROOT_URLCONF = 'webappsretake2024.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for InstrumentationMiddleware
+        'BACKEND': 'register.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -85,11 +122,166 @@ WSGI_APPLICATION = 'webappsretake2024.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'webappsretake.db',
+# SQLite is used for local development and tests. Setting POSTGRES_DB switches
+# to PostgreSQL, with POSTGRES_REPLICA_HOST adding a read replica that
+# register.routers.ReplicaRouter uses for the read-only list views and reports.
+
+if os.environ.get('POSTGRES_DB'):
+    def postgres_database(host):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': host,
+            'PORT': os.environ.get('POSTGRES_PORT', ''),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        if os.environ.get('POSTGRES_POOL'):
+            # psycopg's connection pool, which Django requires to be used
+            # without persistent connections
+            database['OPTIONS']['pool'] = True
+            database['CONN_MAX_AGE'] = 0
+        else:
+            database['CONN_MAX_AGE'] = int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60))
+        return database
+
+    DATABASES = {'default': postgres_database(os.environ.get('POSTGRES_HOST', ''))}
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database(os.environ['POSTGRES_REPLICA_HOST'])
+        # Tests run against a single database, the replica alias points at it
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'webappsretake.db',
+            'OPTIONS': {
+                # Seconds a writer waits on a locked database before failing,
+                # WAL mode itself is switched on in register.database.configure_sqlite
+                'timeout': 20,
+                # Take the write lock when a transaction starts, a deferred
+                # transaction that reads and then writes cannot wait on the
+                # busy timeout and fails with "database is locked" instead
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # A file rather than the shared in-memory database so concurrent tests
+            # get real locking and the busy timeout instead of "table is locked"
+            'TEST': {
+                'NAME': BASE_DIR / 'test_webappsretake.db',
+            },
+        }
     }
+
+DATABASE_ROUTERS = ['register.routers.ReplicaRouter']
+
+# SQLite databases are switched to WAL when first opened, which is recorded in
+# the file itself (the -wal/-shm files beside it are ignored by git). SQLITE_WAL=0
+# keeps the rollback journal, for example to leave the committed
+# webappsretake.db byte for byte as checked out.
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') != '0'
+
+
+# Two caches. 'default' holds disposable copies that can always be rebuilt:
+# the versioned fragment/payload cache (register.caching), role lookups,
+# dashboards, choices and counters. 'state' holds what must not be culled to
+# make room for them: admission buckets, idempotency keys and cached sessions.
+#
+# CACHE_BACKEND picks local memory (the default, per process), a directory
+# given by CACHE_LOCATION, or a Redis compatible server at CACHE_LOCATION such
+# as redis://127.0.0.1:6379/1. STATE_CACHE_BACKEND and STATE_CACHE_LOCATION
+# default to the same backend, in a directory of its own beside CACHE_LOCATION
+# or under its own key prefix on the same Redis server.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+
+def cache_settings(backend, location, max_entries, **extra):
+    config = {'BACKEND': CACHE_BACKENDS[backend], 'LOCATION': location, **extra}
+    if backend != 'redis':
+        # Local memory and file caches cull a third of their entries once
+        # they hold MAX_ENTRIES, which is only 300 unless set
+        config['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    return config
+
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+STATE_CACHE_BACKEND = os.environ.get('STATE_CACHE_BACKEND', CACHE_BACKEND)
+STATE_CACHE_LOCATION = os.environ.get('STATE_CACHE_LOCATION', {
+    'locmem': 'state',
+    'file': f'{CACHE_LOCATION.rstrip("/")}-state',
+    'redis': CACHE_LOCATION,
+}[STATE_CACHE_BACKEND])
+
+CACHES = {
+    'default': cache_settings(CACHE_BACKEND, CACHE_LOCATION, int(os.environ.get('CACHE_MAX_ENTRIES', 100_000))),
+    # Never culled, entries only go when they expire
+    'state': cache_settings(STATE_CACHE_BACKEND, STATE_CACHE_LOCATION, 2 ** 62, KEY_PREFIX='state'),
+}
+
+
+# Sessions. SESSION_MODE=cached_db keeps the database as the store of record
+# with reads from the cache, cache skips the database altogether and
+# signed_cookies keeps the session in the browser so logins write nothing
+# server side. The cache modes use the never-culled 'state' cache above, and
+# cache alone needs it shared between processes and kept across restarts
+# (STATE_CACHE_BACKEND=file or redis), as nothing else holds the session.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+if SESSION_MODE == 'cache' and STATE_CACHE_BACKEND == 'locmem':
+    raise ImproperlyConfigured(
+        'SESSION_MODE=cache needs STATE_CACHE_BACKEND=file or redis, local memory sessions are per process '
+        'and lost on restart'
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'state'
+
+
+# Password hashing. The first hasher hashes new passwords and the others only
+# verify old ones, anything not matching the first (algorithm or work factor)
+# is rehashed when the user next logs in.
+
+PASSWORD_HASHERS = [
+    'register.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Cost of a login, leave unset for Django's current default
+if os.environ.get('PASSWORD_PBKDF2_ITERATIONS'):
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ['PASSWORD_PBKDF2_ITERATIONS'])
+
+
+# Admission control for the POSTs students hammer when the catalogue opens
+# (register.admission). Rates are tokens per second, bursts how many can be
+# saved up, and a request that finds max_in_flight running waits up to
+# queue_timeout seconds behind at most max_queue others. The cache store shares
+# buckets between processes through the never-culled 'state' cache, which also
+# holds the idempotency keys, the in-process store is exact but per process.
+
+ADMISSION_BUCKET_STORE = os.environ.get('ADMISSION_BUCKET_STORE', 'register.admission.CacheBucketStore')
+ADMISSION_CACHE_ALIAS = 'state'
+
+ADMISSION_CONTROL = {
+    'request_project': {'user_rate': 0.5, 'user_burst': 3, 'global_rate': 50, 'global_burst': 200,
+                        'max_in_flight': 8, 'max_queue': 32, 'queue_timeout': 2.0},
+    'propose_project': {'user_rate': 0.2, 'user_burst': 2, 'global_rate': 20, 'global_burst': 50,
+                        'max_in_flight': 4, 'max_queue': 16, 'queue_timeout': 2.0},
 }
 
 